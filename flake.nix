@@ -126,6 +126,8 @@
 
           dependencies = [
             pythonPackages.python-telegram-bot
+            pythonPackages.aiolimiter
+            pythonPackages.tornado
             pythonPackages.httpx
             pythonPackages.pydantic
             pythonPackages.pydantic-settings
@@ -177,6 +179,8 @@
           ps.pytest-httpx
           ps.pytest-mock
           ps.python-telegram-bot
+          ps.aiolimiter
+          ps.tornado
           ps.httpx
           ps.pydantic
           ps.pydantic-settings
@@ -233,6 +237,8 @@
           packages = [
             python
             pythonPackages.python-telegram-bot
+            pythonPackages.aiolimiter
+            pythonPackages.tornado
             pythonPackages.httpx
             pythonPackages.pydantic
             pythonPackages.pydantic-settings
@@ -9,6 +9,8 @@ let
   pythonEnv = python.withPackages (
     ps: [
       ps.python-telegram-bot
+      ps.aiolimiter
+      ps.tornado
       ps.httpx
       ps.pydantic
       ps.pydantic-settings
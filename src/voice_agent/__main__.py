@@ -1,5 +1,6 @@
 """Entry point for voice-agent."""
 
+import asyncio
 import logging
 import sys
 
@@ -7,6 +8,16 @@ from voice_agent.bot import VoiceAgentBot
 from voice_agent.config import load_settings
 
 
+def _install_uvloop() -> None:
+    """Use uvloop as the event loop when it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logging.info("Using uvloop event loop")
+
+
 def main() -> None:
     """Run the voice agent bot."""
     logging.basicConfig(
@@ -20,6 +31,7 @@ def main() -> None:
         logging.error("Failed to load settings: %s", e)
         sys.exit(1)
 
+    _install_uvloop()
     bot = VoiceAgentBot(settings)
     bot.run()
 
@@ -6,29 +6,383 @@ Handles voice messages and routes them to Claude sessions.
 import asyncio
 import base64
 import contextlib
+import datetime
+import functools
+import importlib.util
+import io
 import json
 import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine
+from dataclasses import dataclass, field
+from html import escape
 from pathlib import Path
 from typing import Any
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+import httpx
+from telegram import (
+    Bot,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+    Update,
+    Voice,
+)
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
+    AIORateLimiter,
     Application,
+    ApplicationHandlerStop,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
 from voice_agent.config import Settings
-from voice_agent.router import CommandType, parse_command
-from voice_agent.sessions import ImageAttachment, SessionManager, SessionStorage
-from voice_agent.telegram_format import convert_markdown_to_telegram
+from voice_agent.router import CommandType, ParsedCommand, parse_command
+from voice_agent.sessions import (
+    ImageAttachment,
+    Session,
+    SessionManager,
+    SessionStorage,
+    StickyApproval,
+)
+from voice_agent.telegram_format import ESCAPE_CHARS, convert_markdown_to_telegram
 from voice_agent.transcribe import TranscriptionError, transcribe
 
 logger = logging.getLogger(__name__)
 
+# Longer output is split across messages, preferring line breaks
+_MESSAGE_MAX_CHARS = 4096
+
+# Seconds to wait for a cancelled prompt to wind down before forcing it
+_CANCEL_TIMEOUT = 2.0
+
+# Prompts a chat may have running or queued before new ones are refused
+_MAX_QUEUED_PROMPTS = 5
+
+# Seconds an outgoing Bot API call may wait for a free pooled connection
+_BOT_POOL_TIMEOUT = 10.0
+
+# Retries on RetryAfter before an outgoing Telegram call gives up
+_SEND_MAX_RETRIES = 3
+
+# Connection pool for the shared whisper-server client
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=32, max_keepalive_connections=8, keepalive_expiry=75
+)
+
+_START_TEXT = (
+    "Voice Agent ready. Send a voice or text message.\n\n"
+    "Commands:\n"
+    "- 'status' to check session state\n"
+    "- 'sessions' to manage multiple sessions\n"
+    "- 'resume' to pick up the last SSH session\n"
+    "- 'restart' to reset (keeps context)\n"
+    "- 'clear' to wipe context\n"
+    "- 'yes/approve' or 'no/reject' for permission prompts\n"
+    "- 'always approve' to sticky-approve similar tool calls\n"
+    "- 'clear sticky' to reset sticky approvals\n"
+    "- 'escape/stop task/abort' to cancel running task"
+)
+
+# Static keyboards, shared by every prompt
+_STOP_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("🛑 Stop", callback_data="cancel")]]
+)
+_PERMISSION_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [
+            InlineKeyboardButton("Approve", callback_data="approve"),
+            InlineKeyboardButton("Always", callback_data="sticky_approve"),
+            InlineKeyboardButton("Reject", callback_data="reject"),
+        ]
+    ]
+)
+_RESTART_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [
+            InlineKeyboardButton("Yes, restart", callback_data="confirm_restart"),
+            InlineKeyboardButton("Cancel", callback_data="cancel_restart"),
+        ]
+    ]
+)
+_NEW_SESSION_BUTTON = InlineKeyboardButton("+ New Session", callback_data="session_new")
+_REVOKE_ALL_BUTTON = InlineKeyboardButton("🗑️ Revoke All", callback_data="revoke_all")
+
+
+@functools.lru_cache(maxsize=64)
+def _revoke_button(index: int) -> InlineKeyboardButton:
+    """Build the button revoking the sticky approval at an index."""
+    return InlineKeyboardButton(f"❌ {index + 1}", callback_data=f"revoke_{index}")
+
+
+def _button_rows(
+    buttons: list[InlineKeyboardButton], width: int
+) -> list[list[InlineKeyboardButton]]:
+    """Split buttons into keyboard rows of at most width buttons."""
+    return [buttons[i : i + width] for i in range(0, len(buttons), width)]
+
+
+# Short chunks (tool headers, status banners) repeat often, so their
+# formatted form is cached; long one-off payloads bypass the cache and are
+# formatted in a worker thread to keep the event loop free for other chats
+_FORMAT_CACHE_MAX_LEN = 2048
+
+# Text containing none of these needs no Markdown conversion or escaping
+_MARKDOWN_CHARS = frozenset(ESCAPE_CHARS + "\\")
+
+
+@functools.lru_cache(maxsize=256)
+def _format_cached(text: str) -> str:
+    """Convert Markdown to Telegram MarkdownV2, memoizing the result."""
+    return convert_markdown_to_telegram(text)
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_cached(text: str, project_names: tuple[str, ...]) -> ParsedCommand:
+    """Parse a command, memoizing repeats like "status" or "yes".
+
+    Parsing only looks at project names, so they stand in for the projects
+    mapping. Their order is kept since it decides partial matches.
+    """
+    return parse_command(text, dict.fromkeys(project_names, ""))
+
+
+def _voice_seconds(voice: Voice) -> float:
+    """Get a voice note's duration in seconds.
+
+    PTB reports durations as int seconds, or as timedelta once opted in.
+    """
+    duration = voice.duration
+    if isinstance(duration, datetime.timedelta):
+        return duration.total_seconds()
+    return duration
+
+
+def _is_not_modified(error: Exception) -> bool:
+    """Check whether an edit failed only because the text was unchanged.
+
+    Telegram trims trailing whitespace, so an edit that only appends
+    whitespace is rejected as "Message is not modified".
+    """
+    return isinstance(error, BadRequest) and "not modified" in error.message.lower()
+
+
+async def _delete_quietly(message: Message) -> None:
+    """Delete a message, logging instead of raising if Telegram refuses.
+
+    Args:
+        message: Message to delete.
+    """
+    try:
+        await message.delete()
+    except TelegramError as e:
+        logger.warning("Failed to delete message %s: %s", message.message_id, e)
+
+
+def _split_message(text: str, limit: int = _MESSAGE_MAX_CHARS) -> list[str]:
+    """Split text into parts that fit in one Telegram message.
+
+    Args:
+        text: Text to split.
+        limit: Maximum characters per part.
+
+    Returns:
+        Parts in order, cut at the last line break within the limit where
+        there is one.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            parts.append(text[:limit])
+            text = text[limit:]
+        else:
+            parts.append(text[:cut])
+            text = text[cut + 1 :]
+    parts.append(text)
+    return parts
+
+
+async def _to_markdown(text: str, cache: bool = True) -> tuple[str, str | None]:
+    """Convert text to Telegram MarkdownV2 for sending.
+
+    Args:
+        text: Text that may contain Markdown.
+        cache: Whether a short result may be memoized; off for one-off text
+            such as streamed output that keeps growing.
+
+    Returns:
+        The text to send and its parse mode. Text that needs no conversion,
+        or fails to convert, comes back unchanged with no parse mode.
+    """
+    if _MARKDOWN_CHARS.isdisjoint(text):
+        return text, None
+    try:
+        if len(text) >= _FORMAT_CACHE_MAX_LEN:
+            formatted = await asyncio.to_thread(convert_markdown_to_telegram, text)
+        elif cache:
+            formatted = _format_cached(text)
+        else:
+            formatted = convert_markdown_to_telegram(text)
+    except Exception as e:
+        logger.debug("Markdown formatting failed, falling back to plain: %s", e)
+        return text, None
+    return formatted, "MarkdownV2"
+
+
+async def _format_parts(
+    text: str, cache: bool = True, limit: int = _MESSAGE_MAX_CHARS
+) -> list[tuple[str, str, str | None]]:
+    """Split text into parts whose formatted form fits in one message.
+
+    Escaping makes MarkdownV2 longer than the raw text, so a part that
+    outgrows the limit once formatted is split again with a raw limit
+    shrunk by the same ratio.
+
+    Args:
+        text: Text to split and format.
+        cache: Whether short parts may use the formatting cache.
+        limit: Maximum raw characters per part.
+
+    Returns:
+        (raw, formatted, parse_mode) for each part, in order.
+    """
+    parts = []
+    for part in _split_message(text, limit):
+        formatted, parse_mode = await _to_markdown(part, cache)
+        if len(formatted) > _MESSAGE_MAX_CHARS and len(part) > 1:
+            smaller = max(1, len(part) * _MESSAGE_MAX_CHARS // len(formatted))
+            parts.extend(await _format_parts(part, cache, smaller))
+        else:
+            parts.append((part, formatted, parse_mode))
+    return parts
+
+
+async def _until_cancelled(
+    stream: AsyncIterator[str],
+    cancel_event: asyncio.Event,
+    idle: float | None = None,
+) -> AsyncIterator[str | None]:
+    """Yield chunks from a stream until it ends or a cancel is signalled.
+
+    Waits on the next chunk and the cancel event together, so a cancel
+    takes effect immediately rather than after the next chunk arrives.
+
+    Args:
+        stream: Source of response chunks.
+        cancel_event: Event set when the user cancels.
+        idle: If given, yield None each time this many seconds pass
+            without a chunk, so the caller can flush buffered output.
+
+    Yields:
+        Chunks from the stream, or None after an idle period.
+    """
+    cancelled: asyncio.Future[Any] = asyncio.ensure_future(cancel_event.wait())
+    next_chunk: asyncio.Future[str] | None = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(anext(stream))
+            await asyncio.wait(
+                {next_chunk, cancelled},
+                timeout=idle,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if cancel_event.is_set():
+                return
+            if not next_chunk.done():
+                yield None
+                continue
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                return
+            next_chunk = None
+            yield chunk
+    finally:
+        cancelled.cancel()
+        if next_chunk is not None and not next_chunk.done():
+            next_chunk.cancel()
+
+
+@dataclass(slots=True)
+class _ChatState:
+    """Per-chat bot state, kept while the chat has work or a rename pending.
+
+    Attributes:
+        lock: Serializes prompts within the chat.
+        cancel: Set to make the running prompt stop streaming and clean up.
+        running: Prompt task currently holding the lock.
+        pending: Prompts scheduled and not yet finished.
+        pending_rename: Session whose new name the next text message sets.
+        voice_lock: Serializes voice notes within the chat.
+        voices: Voice notes waiting for or holding the voice lock.
+    """
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    cancel: asyncio.Event = field(default_factory=asyncio.Event)
+    running: asyncio.Task[None] | None = None
+    pending: int = 0
+    pending_rename: str | None = None
+    voice_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    voices: int = 0
+
+
+def _require_session(
+    handler: Callable[["VoiceAgentBot", int, Session, Update], Awaitable[None]],
+) -> Callable[["VoiceAgentBot", int, Update], Coroutine[Any, Any, None]]:
+    """Resolve the active session before running a command handler.
+
+    Replies "No active session." instead when the chat has none.
+
+    Args:
+        handler: Handler taking the resolved session after the chat ID.
+
+    Returns:
+        Handler with the standard (chat_id, update) signature.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(self: "VoiceAgentBot", chat_id: int, update: Update) -> None:
+        session = self.session_manager.get(chat_id)
+        if not session:
+            await update.message.reply_text("No active session.")  # type: ignore
+            return
+        await handler(self, chat_id, session, update)
+
+    return wrapper
+
+
+def _require_callback_session(
+    handler: Callable[..., Awaitable[None]],
+) -> Callable[..., Coroutine[Any, Any, None]]:
+    """Resolve the active session before running a button callback.
+
+    Edits the message to "No active session." instead when the chat has
+    none. The callback query must be the last argument.
+
+    Args:
+        handler: Callback taking the resolved session after the chat ID.
+
+    Returns:
+        Callback with the (chat_id, ..., query) signature.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(self: "VoiceAgentBot", chat_id: int, *args: Any) -> None:
+        session = self.session_manager.get(chat_id)
+        if not session:
+            await args[-1].edit_message_text("No active session.")
+            return
+        await handler(self, chat_id, session, *args)
+
+    return wrapper
+
 
 class VoiceAgentBot:
     """Telegram bot for voice control of Claude Code.
@@ -36,7 +390,7 @@ class VoiceAgentBot:
     Attributes:
         settings: Application settings.
         session_manager: Manages Claude sessions.
-        allowed_chat_ids: Set of chat IDs allowed to use the bot.
+        allowed_chat_ids: Frozen set of chat IDs allowed to use the bot.
     """
 
     def __init__(self, settings: Settings) -> None:
@@ -51,12 +405,57 @@ class VoiceAgentBot:
             default_cwd=settings.default_cwd,
             permission_timeout=settings.permission_timeout,
             storage=self.storage,
+            max_live_clients=settings.max_live_clients,
         )
         self.allowed_chat_ids = settings.get_allowed_chat_ids()
-        self._prompt_locks: dict[int, asyncio.Lock] = {}
-        self._active_tasks: dict[int, asyncio.Task[None]] = {}
-        self._cancel_flags: dict[int, bool] = {}
-        self._pending_renames: dict[int, str] = {}  # chat_id -> session name to rename
+        self._no_whitelist = not self.allowed_chat_ids
+        self._chats: dict[int, _ChatState] = {}
+        self._http: httpx.AsyncClient | None = None
+        # Queue voice notes from all chats in front of whisper-server so a
+        # burst waits here instead of timing out server-side
+        self._whisper_slots = asyncio.Semaphore(settings.whisper_concurrency)
+        self._project_names = tuple(settings.projects)
+        # Commands that only need the chat and update; SWITCH_PROJECT and
+        # PROMPT carry extra data and are handled in _handle_transcription
+        self._command_handlers: dict[
+            CommandType, Callable[[int, Update], Awaitable[None]]
+        ] = {
+            CommandType.APPROVE: self._handle_approve,
+            CommandType.REJECT: self._handle_reject,
+            CommandType.STICKY_APPROVE: self._handle_sticky_approve,
+            CommandType.CLEAR_STICKY: self._handle_clear_sticky,
+            CommandType.STATUS: self._handle_status,
+            CommandType.CLEAR: self._handle_clear,
+            CommandType.CANCEL: self._handle_cancel,
+            CommandType.LIST_APPROVALS: self._handle_list_approvals,
+            CommandType.RESTART: self._handle_restart,
+            CommandType.RESUME: self._handle_resume,
+            CommandType.SESSIONS: self._handle_sessions,
+        }
+        # Button callbacks: exact callback data first, then prefixes whose
+        # remainder is the argument. Longer prefixes come before their own
+        # prefixes ("session_close_confirm_" before "session_close_").
+        self._callback_handlers: dict[str, Callable[[int, Any], Awaitable[None]]] = {
+            "session_new": self._handle_session_new_callback,
+            "approve": self._handle_approve_callback,
+            "sticky_approve": self._handle_sticky_approve_callback,
+            "reject": self._handle_reject_callback,
+            "cancel": self._handle_cancel_callback,
+            "revoke_all": self._handle_revoke_all_callback,
+            "confirm_restart": self._handle_confirm_restart_callback,
+            "cancel_restart": self._handle_cancel_restart_callback,
+        }
+        self._callback_prefixes: tuple[
+            tuple[str, Callable[[int, str, Any], Awaitable[None]]], ...
+        ] = (
+            ("resume_", self._handle_resume_callback),
+            ("session_switch_", self._handle_session_switch_callback),
+            ("session_close_confirm_", self._handle_session_close_confirm_callback),
+            ("session_close_cancel_", self._handle_session_close_cancel_callback),
+            ("session_close_", self._handle_session_close_callback),
+            ("session_rename_", self._handle_session_rename_callback),
+            ("revoke_", self._handle_revoke_callback),
+        )
 
     def is_allowed(self, chat_id: int) -> bool:
         """Check if a chat ID is allowed to use the bot.
@@ -67,9 +466,51 @@ class VoiceAgentBot:
         Returns:
             True if allowed (or if no whitelist configured).
         """
-        if not self.allowed_chat_ids:
-            return True
-        return chat_id in self.allowed_chat_ids
+        return self._no_whitelist or chat_id in self.allowed_chat_ids
+
+    async def _acl_gate(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> None:
+        """Stop dispatch of updates from non-allowed chats.
+
+        Runs ahead of all other handlers so updates from unknown chats are
+        dropped without reaching per-command routing.
+
+        Args:
+            update: Telegram update.
+            context: Callback context.
+
+        Raises:
+            ApplicationHandlerStop: If the chat is not allowed.
+        """
+        chat = update.effective_chat
+        if chat is not None and not self.is_allowed(chat.id):
+            logger.debug("Dropping update from non-allowed chat %s", chat.id)
+            raise ApplicationHandlerStop
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use.
+
+        Created lazily so it binds to the running event loop.
+
+        Returns:
+            Pooled client reused across transcription requests.
+        """
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(limits=_HTTP_LIMITS)
+        return self._http
+
+    async def _post_shutdown(self, app: Application) -> None:  # type: ignore
+        """Close shared resources when the application stops.
+
+        Args:
+            app: The stopping application.
+        """
+        await self.session_manager.shutdown()
+        self.storage.flush()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def start_command(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -87,19 +528,7 @@ class VoiceAgentBot:
         if not self.is_allowed(chat_id):
             return
 
-        await update.message.reply_text(  # type: ignore
-            "Voice Agent ready. Send a voice or text message.\n\n"
-            "Commands:\n"
-            "- 'status' to check session state\n"
-            "- 'sessions' to manage multiple sessions\n"
-            "- 'resume' to pick up the last SSH session\n"
-            "- 'restart' to reset (keeps context)\n"
-            "- 'clear' to wipe context\n"
-            "- 'yes/approve' or 'no/reject' for permission prompts\n"
-            "- 'always approve' to sticky-approve similar tool calls\n"
-            "- 'clear sticky' to reset sticky approvals\n"
-            "- 'escape/stop task/abort' to cancel running task"
-        )
+        await update.message.reply_text(_START_TEXT)  # type: ignore
 
     async def status_command(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -117,11 +546,7 @@ class VoiceAgentBot:
         if not self.is_allowed(chat_id):
             return
 
-        status = self.session_manager.get_status(chat_id)
-        if status:
-            await update.message.reply_text(status)  # type: ignore
-        else:
-            await update.message.reply_text("No active session.")  # type: ignore
+        await self._handle_status(chat_id, update)
 
     async def handle_text(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -134,24 +559,28 @@ class VoiceAgentBot:
         """
         if not update.effective_chat or not update.message:
             return
+        message = update.message
 
         chat_id = update.effective_chat.id
         if not self.is_allowed(chat_id):
             logger.debug("Ignoring text from non-allowed chat %s", chat_id)
             return
 
-        text = update.message.text
+        text = message.text
         if not text:
             return
 
         # Check for pending rename
-        if chat_id in self._pending_renames:
-            old_name = self._pending_renames.pop(chat_id)
+        state = self._chats.get(chat_id)
+        old_name = state.pending_rename if state else None
+        if state and old_name is not None:
+            state.pending_rename = None
+            self._release_chat_state(chat_id, state)
             new_name = text.strip()
             if self.session_manager.rename_session(chat_id, old_name, new_name):
-                await update.message.reply_text(f"Renamed '{old_name}' → '{new_name}'")
+                await message.reply_text(f"Renamed '{old_name}' → '{new_name}'")
             else:
-                await update.message.reply_text(
+                await message.reply_text(
                     f"Failed to rename. Name '{new_name}' may already exist."
                 )
             return
@@ -170,49 +599,107 @@ class VoiceAgentBot:
         """
         if not update.effective_chat or not update.message:
             return
+        message = update.message
 
         chat_id = update.effective_chat.id
         if not self.is_allowed(chat_id):
             logger.debug("Ignoring voice from non-allowed chat %s", chat_id)
             return
 
-        voice = update.message.voice
+        voice = message.voice
         if not voice:
             return
 
+        # Accidental taps produce near-empty clips; skip them before any
+        # download or transcription
+        if _voice_seconds(voice) < self.settings.min_voice_seconds:
+            await message.reply_text("Voice message too short.")
+            return
+
+        # Handle one voice note per chat at a time so prompts are queued in
+        # the order they were spoken, even if a later note transcribes faster
+        state = self._chat_state(chat_id)
+        state.voices += 1
+        try:
+            async with state.voice_lock:
+                await self._process_voice(chat_id, message, voice, update, context)
+        finally:
+            state.voices -= 1
+            self._release_chat_state(chat_id, state)
+
+    async def _process_voice(
+        self,
+        chat_id: int,
+        message: Message,
+        voice: Voice,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+    ) -> None:
+        """Download, transcribe and submit a voice note as a prompt.
+
+        Args:
+            chat_id: Telegram chat ID.
+            message: Message carrying the voice note.
+            voice: The voice note.
+            update: Telegram update.
+            context: Callback context.
+        """
         # Download audio
         try:
             file = await context.bot.get_file(voice.file_id)
-            audio_bytes = await file.download_as_bytearray()
+            # Download into a file object that the upload streams from
+            # directly, instead of copying a bytearray into bytes
+            audio = io.BytesIO()
+            await file.download_to_memory(audio)
             logger.info(
-                "Downloaded %d bytes of audio from chat %s", len(audio_bytes), chat_id
+                "Downloaded %d bytes of audio from chat %s", audio.tell(), chat_id
             )
+            audio.seek(0)
         except Exception as e:
             logger.error("Failed to download voice: %s", e)
-            await update.message.reply_text(f"Failed to download audio: {e}")
+            await message.reply_text(f"Failed to download audio: {e}")
             return
 
-        # Transcribe
-        try:
-            text = await transcribe(bytes(audio_bytes), self.settings.whisper_url)
+        # Delete the voice message to keep chat clean while it is transcribed
+        delete_task = asyncio.create_task(_delete_quietly(message))
+        chat_updates: list[Awaitable[Any]] = [delete_task]
 
-            # Delete the voice message to keep chat clean
-            await update.message.delete()
+        try:
+            # Transcribe
+            try:
+                async with self._whisper_slots:
+                    text = await transcribe(
+                        audio,
+                        self.settings.whisper_url,
+                        client=self._get_http_client(),
+                    )
+            except Exception as e:
+                logger.error(
+                    "Transcription failed: %s",
+                    e,
+                    exc_info=not isinstance(e, TranscriptionError),
+                )
+                # The voice message is gone, so post instead of replying to it
+                chat_updates.append(
+                    message.chat.send_message(f"Transcription failed: {e}")
+                )
+                await asyncio.gather(*chat_updates)
+                return
 
             # Echo transcription unless it's a skill invocation
             stripped = text.strip()
             is_skill = stripped.lower().startswith("skill ")
             if not stripped.startswith("/") and not is_skill:
-                from html import escape
-
                 tag = self._session_tag(chat_id)
-                await update.message.chat.send_message(
-                    f"{tag} <i>{escape(text)}</i>", parse_mode="HTML"
+                chat_updates.append(
+                    message.chat.send_message(
+                        f"{tag} <i>{escape(text)}</i>", parse_mode="HTML"
+                    )
                 )
-        except TranscriptionError as e:
-            logger.error("Transcription failed: %s", e)
-            await update.message.reply_text(f"Transcription failed: {e}")
-            return
+            await asyncio.gather(*chat_updates)
+        finally:
+            # Never leave the delete running unobserved
+            await delete_task
 
         # Voice transcriptions are always sent as prompts to Claude.
         # Commands come from typed text, /commands, and buttons only.
@@ -229,6 +716,7 @@ class VoiceAgentBot:
         """
         if not update.effective_chat or not update.message:
             return
+        message = update.message
 
         chat_id = update.effective_chat.id
         if not self.is_allowed(chat_id):
@@ -236,18 +724,18 @@ class VoiceAgentBot:
             return
 
         # Determine file_id and media_type
-        if update.message.photo:
+        if message.photo:
             # Photos: pick highest resolution (last in the list)
-            photo = update.message.photo[-1]
+            photo = message.photo[-1]
             file_id = photo.file_id
             media_type = "image/jpeg"
         elif (
-            update.message.document
-            and update.message.document.mime_type
-            and update.message.document.mime_type.startswith("image/")
+            (document := message.document)
+            and document.mime_type
+            and document.mime_type.startswith("image/")
         ):
-            file_id = update.message.document.file_id
-            media_type = update.message.document.mime_type
+            file_id = document.file_id
+            media_type = document.mime_type
         else:
             return
 
@@ -262,14 +750,11 @@ class VoiceAgentBot:
             )
         except Exception as e:
             logger.error("Failed to download image: %s", e)
-            await update.message.reply_text(f"Failed to download image: {e}")
+            await message.reply_text(f"Failed to download image: {e}")
             return
 
-        caption = (
-            update.message.caption
-            or "Describe this image and assist with any requests"
-        )
-        image_data = base64.b64encode(bytes(image_bytes)).decode("ascii")
+        caption = message.caption or "Describe this image and assist with any requests"
+        image_data = base64.b64encode(image_bytes).decode("ascii")
         image = ImageAttachment(data=image_data, media_type=media_type)
 
         await self._handle_prompt_with_images(chat_id, caption, [image], update)
@@ -284,70 +769,48 @@ class VoiceAgentBot:
             text: Transcribed text.
             update: Telegram update for replying.
         """
-        command = parse_command(text, self.settings.projects)
-
-        if command.command_type == CommandType.APPROVE:
-            await self._handle_approve(chat_id, update)
-        elif command.command_type == CommandType.REJECT:
-            await self._handle_reject(chat_id, update)
-        elif command.command_type == CommandType.STICKY_APPROVE:
-            await self._handle_sticky_approve(chat_id, update)
-        elif command.command_type == CommandType.CLEAR_STICKY:
-            await self._handle_clear_sticky(chat_id, update)
-        elif command.command_type == CommandType.STATUS:
-            await self._handle_status(chat_id, update)
-        elif command.command_type == CommandType.CLEAR:
-            await self._handle_clear(chat_id, update)
+        # Surrounding whitespace never changes the command, so drop it
+        # before parsing to share cache entries
+        text = text.strip()
+        if not text:
+            return
+        command = _parse_cached(text, self._project_names)
+
+        handler = self._command_handlers.get(command.command_type)
+        if handler is not None:
+            await handler(chat_id, update)
         elif command.command_type == CommandType.SWITCH_PROJECT:
             await self._handle_switch_project(chat_id, command.project, update)
-        elif command.command_type == CommandType.CANCEL:
-            await self._handle_cancel(chat_id, update)
-        elif command.command_type == CommandType.LIST_APPROVALS:
-            await self._handle_list_approvals(chat_id, update)
-        elif command.command_type == CommandType.RESTART:
-            await self._handle_restart(chat_id, update)
-        elif command.command_type == CommandType.RESUME:
-            await self._handle_resume(chat_id, update)
-        elif command.command_type == CommandType.SESSIONS:
-            await self._handle_sessions(chat_id, update)
         else:
             await self._handle_prompt(chat_id, command.text, update)
 
-    async def _handle_approve(self, chat_id: int, update: Update) -> None:
+    @_require_session
+    async def _handle_approve(
+        self, chat_id: int, session: Session, update: Update
+    ) -> None:
         """Handle permission approval (silent - no feedback needed)."""
-        session = self.session_manager.get(chat_id)
-        if not session:
-            await update.message.reply_text("No active session.")  # type: ignore
-            return
-
         if not session.permission_handler.approve():
             await update.message.reply_text("No pending permission to approve.")  # type: ignore
 
-    async def _handle_reject(self, chat_id: int, update: Update) -> None:
+    @_require_session
+    async def _handle_reject(
+        self, chat_id: int, session: Session, update: Update
+    ) -> None:
         """Handle permission rejection."""
-        session = self.session_manager.get(chat_id)
-        if not session:
-            await update.message.reply_text("No active session.")  # type: ignore
-            return
-
         # Get description before denying
         desc = session.permission_handler.get_pending_description()
         if session.permission_handler.deny("User rejected via voice"):
-            from html import escape
-
             await update.message.reply_text(  # type: ignore
                 f"❌ <b>Rejected:</b> {escape(desc or 'unknown')}", parse_mode="HTML"
             )
         else:
             await update.message.reply_text("No pending permission to reject.")  # type: ignore
 
-    async def _handle_sticky_approve(self, chat_id: int, update: Update) -> None:
+    @_require_session
+    async def _handle_sticky_approve(
+        self, chat_id: int, session: Session, update: Update
+    ) -> None:
         """Handle sticky approval - approve and remember for similar calls."""
-        session = self.session_manager.get(chat_id)
-        if not session:
-            await update.message.reply_text("No active session.")  # type: ignore
-            return
-
         sticky = session.permission_handler.sticky_approve()
         if sticky:
             await update.message.reply_text(  # type: ignore
@@ -356,49 +819,53 @@ class VoiceAgentBot:
         else:
             await update.message.reply_text("No pending permission to sticky approve.")  # type: ignore
 
-    async def _handle_clear_sticky(self, chat_id: int, update: Update) -> None:
+    @_require_session
+    async def _handle_clear_sticky(
+        self, chat_id: int, session: Session, update: Update
+    ) -> None:
         """Handle clearing all sticky approvals."""
-        session = self.session_manager.get(chat_id)
-        if not session:
-            await update.message.reply_text("No active session.")  # type: ignore
-            return
-
         count = session.permission_handler.clear_sticky_approvals()
         if count > 0:
             await update.message.reply_text(f"Cleared {count} sticky approval(s).")  # type: ignore
         else:
             await update.message.reply_text("No sticky approvals to clear.")  # type: ignore
 
-    async def _handle_list_approvals(self, chat_id: int, update: Update) -> None:
+    @_require_session
+    async def _handle_list_approvals(
+        self, chat_id: int, session: Session, update: Update
+    ) -> None:
         """Handle listing all sticky approvals with revoke buttons."""
-        session = self.session_manager.get(chat_id)
-        if not session:
-            await update.message.reply_text("No active session.")  # type: ignore
-            return
-
         approvals = session.permission_handler.get_sticky_approvals()
         if not approvals:
             await update.message.reply_text("No auto-approvals configured.")  # type: ignore
             return
 
-        # Build message with list of approvals
+        text, keyboard = self._approvals_view(approvals)
+        await update.message.reply_text(  # type: ignore
+            text, reply_markup=keyboard, parse_mode="HTML"
+        )
+
+    @staticmethod
+    def _approvals_view(
+        approvals: list[StickyApproval],
+    ) -> tuple[str, InlineKeyboardMarkup]:
+        """Build the approvals list message and its revoke keyboard.
+
+        Args:
+            approvals: Current sticky approvals, in revoke-index order.
+
+        Returns:
+            HTML message text and keyboard with one revoke button per approval.
+        """
         lines = ["<b>Auto-approvals:</b>"]
         for i, approval in enumerate(approvals):
-            lines.append(f"{i + 1}. {approval.describe()}")
-
-        # Build keyboard with revoke buttons (max 4 per row)
-        buttons = [
-            InlineKeyboardButton(f"❌ {i + 1}", callback_data=f"revoke_{i}")
-            for i in range(len(approvals))
-        ]
-        # Chunk into rows of 4
-        rows = [buttons[i : i + 4] for i in range(0, len(buttons), 4)]
-        rows.append([InlineKeyboardButton("🗑️ Revoke All", callback_data="revoke_all")])
-        keyboard = InlineKeyboardMarkup(rows)
+            lines.append(f"{i + 1}. {escape(approval.describe())}")
 
-        await update.message.reply_text(  # type: ignore
-            "\n".join(lines), reply_markup=keyboard, parse_mode="HTML"
-        )
+        # Revoke buttons, max 4 per row
+        buttons = [_revoke_button(i) for i in range(len(approvals))]
+        rows = _button_rows(buttons, 4)
+        rows.append([_REVOKE_ALL_BUTTON])
+        return "\n".join(lines), InlineKeyboardMarkup(rows)
 
     async def approvals_command(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -432,97 +899,109 @@ class VoiceAgentBot:
         if not chat_id or not self.is_allowed(chat_id):
             return
 
-        # Handle resume selection
-        if query.data.startswith("resume_"):
-            session_id = query.data[7:]
-            await self._handle_resume_callback(chat_id, session_id, query)
-            return
-
-        # Handle session operations first (don't require existing session)
-        if query.data == "session_new":
-            await self._handle_session_new_callback(chat_id, query)
-            return
-        if query.data.startswith("session_switch_"):
-            name = query.data[15:]
-            await self._handle_session_switch_callback(chat_id, name, query)
+        data = query.data
+        handler = self._callback_handlers.get(data)
+        if handler:
+            await handler(chat_id, query)
             return
-        if query.data.startswith("session_close_confirm_"):
-            name = query.data[22:]
-            await self._handle_session_close_confirm_callback(chat_id, name, query)
-            return
-        if query.data.startswith("session_close_cancel_"):
+        for prefix, prefix_handler in self._callback_prefixes:
+            arg = data.removeprefix(prefix)
+            if arg != data:
+                await prefix_handler(chat_id, arg, query)
+                return
+
+    @_require_callback_session
+    async def _handle_approve_callback(
+        self, chat_id: int, session: Session, query: Any
+    ) -> None:
+        """Handle approve button click."""
+        if session.permission_handler.approve():
             await query.delete_message()
+        else:
+            await query.edit_message_text("No pending permission.")
+
+    @_require_callback_session
+    async def _handle_sticky_approve_callback(
+        self, chat_id: int, session: Session, query: Any
+    ) -> None:
+        """Handle always-approve button click."""
+        sticky = session.permission_handler.sticky_approve()
+        if sticky:
+            await query.edit_message_text(
+                f"Stickied: {sticky.describe()} auto-approved"
+            )
+        else:
+            await query.edit_message_text("No pending permission.")
+
+    @_require_callback_session
+    async def _handle_reject_callback(
+        self, chat_id: int, session: Session, query: Any
+    ) -> None:
+        """Handle reject button click."""
+        # Get description before denying (deny clears pending)
+        desc = session.permission_handler.get_pending_description()
+        if session.permission_handler.deny("User rejected via button"):
+            await query.edit_message_text(
+                f"❌ <b>Rejected:</b> {escape(desc or 'unknown')}",
+                parse_mode="HTML",
+            )
+        else:
+            await query.edit_message_text("No pending permission.")
+
+    async def _handle_cancel_callback(self, chat_id: int, query: Any) -> None:
+        """Handle Stop button click on a running prompt."""
+        # Don't wait or edit message here - let run_prompt() handle
+        # cleanup to avoid race condition with the finally block
+        if not await self._cancel(chat_id, wait=False):
+            await query.edit_message_text("No running task to cancel.")
+
+    @_require_callback_session
+    async def _handle_revoke_all_callback(
+        self, chat_id: int, session: Session, query: Any
+    ) -> None:
+        """Handle Revoke All button click."""
+        count = session.permission_handler.clear_sticky_approvals()
+        if count > 0:
+            await query.edit_message_text(f"Revoked all {count} auto-approval(s).")
+        else:
+            await query.edit_message_text("No auto-approvals to revoke.")
+
+    @_require_callback_session
+    async def _handle_revoke_callback(
+        self, chat_id: int, session: Session, index_str: str, query: Any
+    ) -> None:
+        """Handle revoke button click for a single sticky approval."""
+        try:
+            index = int(index_str)
+        except ValueError:
+            await query.edit_message_text("Invalid revoke command.")
             return
-        if query.data.startswith("session_close_"):
-            name = query.data[14:]
-            await self._handle_session_close_callback(chat_id, name, query)
-            return
-        if query.data.startswith("session_rename_"):
-            name = query.data[15:]
-            await self._handle_session_rename_callback(chat_id, name, query)
+        removed = session.permission_handler.remove_sticky_approval(index)
+        if not removed:
+            await query.edit_message_text("Invalid approval index.")
             return
 
-        session = self.session_manager.get(chat_id)
-        if not session:
-            await query.edit_message_text("No active session.")
+        # Keep the list open with renumbered buttons so further approvals can
+        # be revoked without running /approvals again
+        remaining = session.permission_handler.get_sticky_approvals()
+        if not remaining:
+            await query.edit_message_text(f"Revoked: {removed.describe()}")
             return
+        text, keyboard = self._approvals_view(remaining)
+        await query.edit_message_text(
+            f"Revoked: {escape(removed.describe())}\n\n{text}",
+            reply_markup=keyboard,
+            parse_mode="HTML",
+        )
 
-        if query.data == "approve":
-            if session.permission_handler.approve():
-                await query.delete_message()
-            else:
-                await query.edit_message_text("No pending permission.")
-        elif query.data == "sticky_approve":
-            sticky = session.permission_handler.sticky_approve()
-            if sticky:
-                await query.edit_message_text(
-                    f"Stickied: {sticky.describe()} auto-approved"
-                )
-            else:
-                await query.edit_message_text("No pending permission.")
-        elif query.data == "reject":
-            # Get description before denying (deny clears pending)
-            desc = session.permission_handler.get_pending_description()
-            if session.permission_handler.deny("User rejected via button"):
-                from html import escape
-
-                await query.edit_message_text(
-                    f"❌ <b>Rejected:</b> {escape(desc or 'unknown')}",
-                    parse_mode="HTML",
-                )
-            else:
-                await query.edit_message_text("No pending permission.")
-        elif query.data == "cancel":
-            task = self._active_tasks.get(chat_id)
-            if task and not task.done():
-                self._cancel_flags[chat_id] = True
-                task.cancel()
-                # Don't edit message here - let run_prompt() handle cleanup
-                # to avoid race condition with the finally block
-            else:
-                await query.edit_message_text("No running task to cancel.")
-        elif query.data == "revoke_all":
-            count = session.permission_handler.clear_sticky_approvals()
-            if count > 0:
-                await query.edit_message_text(f"Revoked all {count} auto-approval(s).")
-            else:
-                await query.edit_message_text("No auto-approvals to revoke.")
-        elif query.data.startswith("revoke_"):
-            index_str = query.data[7:]  # Remove "revoke_" prefix
-            try:
-                index = int(index_str)
-                removed = session.permission_handler.remove_sticky_approval(index)
-                if removed:
-                    await query.edit_message_text(f"Revoked: {removed.describe()}")
-                else:
-                    await query.edit_message_text("Invalid approval index.")
-            except ValueError:
-                await query.edit_message_text("Invalid revoke command.")
-        elif query.data == "confirm_restart":
-            msg = await self._do_restart(chat_id)
-            await query.edit_message_text(msg)
-        elif query.data == "cancel_restart":
-            await query.edit_message_text("Restart cancelled.")
+    async def _handle_confirm_restart_callback(self, chat_id: int, query: Any) -> None:
+        """Handle restart confirmation button click."""
+        msg = await self._do_restart(chat_id)
+        await query.edit_message_text(msg)
+
+    async def _handle_cancel_restart_callback(self, chat_id: int, query: Any) -> None:
+        """Handle restart cancel button click."""
+        await query.edit_message_text("Restart cancelled.")
 
     async def _handle_status(self, chat_id: int, update: Update) -> None:
         """Handle status request."""
@@ -570,8 +1049,6 @@ class VoiceAgentBot:
         Returns:
             List of (session_id, last_user_message, mtime) sorted newest first.
         """
-        import time
-
         projects_dir = Path.home() / ".claude" / "projects"
         if not projects_dir.exists():
             return []
@@ -620,8 +1097,6 @@ class VoiceAgentBot:
             await update.message.reply_text("No sessions found to resume.")  # type: ignore
             return
 
-        import time
-
         rows: list[list[InlineKeyboardButton]] = []
         for sid, last_msg, mtime in sessions:
             age_min = int((time.time() - mtime) / 60)
@@ -677,17 +1152,15 @@ class VoiceAgentBot:
 
     async def _handle_cancel(self, chat_id: int, update: Update) -> None:
         """Handle cancel/escape request to stop running task."""
-        task = self._active_tasks.get(chat_id)
-        if task and not task.done():
-            self._cancel_flags[chat_id] = True
-            task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await task
-            self._active_tasks.pop(chat_id, None)
-            self._cancel_flags.pop(chat_id, None)
-            await update.message.reply_text("⏹️ Task cancelled.")  # type: ignore
-        else:
+        task = self._signal_cancel(chat_id)
+        if task is None:
             await update.message.reply_text("No running task to cancel.")  # type: ignore
+            return
+        # Acknowledge while the prompt winds down rather than after it
+        await asyncio.gather(
+            update.message.reply_text("⏹️ Task cancelled."),  # type: ignore
+            self._wait_stopped(task),
+        )
 
     async def _handle_restart(self, chat_id: int, update: Update) -> None:
         """Handle restart request - show confirmation dialog."""
@@ -701,29 +1174,18 @@ class VoiceAgentBot:
         if sticky_count > 0:
             msg += f"\n\nThis will clear {sticky_count} auto-approval(s)."
 
-        keyboard = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        "Yes, restart", callback_data="confirm_restart"
-                    ),
-                    InlineKeyboardButton("Cancel", callback_data="cancel_restart"),
-                ]
-            ]
+        await update.message.reply_text(  # type: ignore
+            msg, reply_markup=_RESTART_KEYBOARD
         )
-        await update.message.reply_text(msg, reply_markup=keyboard)  # type: ignore
 
     async def _do_restart(self, chat_id: int) -> str:
         """Actually perform the restart. Returns status message."""
-        # Cancel any running task first
-        task = self._active_tasks.get(chat_id)
-        if task and not task.done():
-            self._cancel_flags[chat_id] = True
-            task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await task
-            self._active_tasks.pop(chat_id, None)
-            self._cancel_flags.pop(chat_id, None)
+        # Cancel any running task first. This is not overlapped with
+        # recreating the session: a prompt still streaming could record a
+        # new claude_session_id on the old session after it is read below.
+        # Closing the SDK client only signals its subprocess, so there is
+        # no I/O to overlap with anyway.
+        await self._cancel(chat_id)
 
         # Preserve claude_session_id across restart
         session = self.session_manager.get(chat_id)
@@ -763,8 +1225,11 @@ class VoiceAgentBot:
             self.session_manager.get_or_create(chat_id)
             sessions = self.session_manager.list_sessions(chat_id)
 
-        # Build session list with fruit indicators
+        # Build session list and per-session buttons in one pass
         lines = ["📂 <b>Sessions</b>\n"]
+        switch_buttons: list[InlineKeyboardButton] = []
+        rename_buttons: list[InlineKeyboardButton] = []
+        close_buttons: list[InlineKeyboardButton] = []
         fruits = self._SESSION_FRUITS
         for i, s in enumerate(sessions):
             fruit = fruits[i % len(fruits)]
@@ -774,46 +1239,27 @@ class VoiceAgentBot:
                 f"{fruit} {s.name}{active}"
                 f" · {s.message_count} msgs · {cwd_short}"
             )
-
-        # Build keyboard
-        rows: list[list[InlineKeyboardButton]] = []
-
-        # Switch buttons row
-        switch_buttons = [
-            InlineKeyboardButton(
-                f"{fruits[i % len(fruits)]} {s.name}",
-                callback_data=f"session_switch_{s.name}",
+            switch_buttons.append(
+                InlineKeyboardButton(
+                    f"{fruit} {s.name}", callback_data=f"session_switch_{s.name}"
+                )
             )
-            for i, s in enumerate(sessions)
-        ]
-        # Chunk switch buttons into rows of 2
-        for i in range(0, len(switch_buttons), 2):
-            rows.append(switch_buttons[i : i + 2])
-
-        # New session button
-        rows.append(
-            [InlineKeyboardButton("+ New Session", callback_data="session_new")]
-        )
-
-        # Rename buttons row
-        rename_buttons = [
-            InlineKeyboardButton(
-                f"✏️ {fruits[i % len(fruits)]}", callback_data=f"session_rename_{s.name}"
+            rename_buttons.append(
+                InlineKeyboardButton(
+                    f"✏️ {fruit}", callback_data=f"session_rename_{s.name}"
+                )
             )
-            for i, s in enumerate(sessions)
-        ]
-        for i in range(0, len(rename_buttons), 2):
-            rows.append(rename_buttons[i : i + 2])
-
-        # Close buttons row
-        close_buttons = [
-            InlineKeyboardButton(
-                f"✕ {fruits[i % len(fruits)]}", callback_data=f"session_close_{s.name}"
+            close_buttons.append(
+                InlineKeyboardButton(
+                    f"✕ {fruit}", callback_data=f"session_close_{s.name}"
+                )
             )
-            for i, s in enumerate(sessions)
-        ]
-        for i in range(0, len(close_buttons), 2):
-            rows.append(close_buttons[i : i + 2])
+
+        # Switch buttons in rows of 2, then new session, rename and close rows
+        rows = _button_rows(switch_buttons, 2)
+        rows.append([_NEW_SESSION_BUTTON])
+        rows += _button_rows(rename_buttons, 2)
+        rows += _button_rows(close_buttons, 2)
 
         keyboard = InlineKeyboardMarkup(rows)
 
@@ -861,9 +1307,7 @@ class VoiceAgentBot:
         self, chat_id: int, name: str, query: Any
     ) -> None:
         """Handle session close button click - show confirmation."""
-        sessions = self.session_manager.list_sessions(chat_id)
-        session_info = next((s for s in sessions if s.name == name), None)
-
+        session_info = self.session_manager.get_session_info(chat_id, name)
         if not session_info:
             await query.edit_message_text(f"Session '{name}' not found.")
             return
@@ -886,6 +1330,12 @@ class VoiceAgentBot:
         )
         await query.edit_message_text(msg, reply_markup=keyboard)
 
+    async def _handle_session_close_cancel_callback(
+        self, chat_id: int, name: str, query: Any
+    ) -> None:
+        """Handle session close cancel button click."""
+        await query.delete_message()
+
     async def _handle_session_close_confirm_callback(
         self, chat_id: int, name: str, query: Any
     ) -> None:
@@ -900,7 +1350,7 @@ class VoiceAgentBot:
         self, chat_id: int, name: str, query: Any
     ) -> None:
         """Handle session rename button click - prompt for new name."""
-        self._pending_renames[chat_id] = name
+        self._chat_state(chat_id).pending_rename = name
         await query.edit_message_text(f"Send new name for session '{name}':")
 
     async def restart_command(
@@ -921,60 +1371,194 @@ class VoiceAgentBot:
 
         await self._handle_restart(chat_id, update)
 
-    def _get_prompt_lock(self, chat_id: int) -> asyncio.Lock:
-        """Get or create a lock for serializing prompts per chat."""
-        if chat_id not in self._prompt_locks:
-            self._prompt_locks[chat_id] = asyncio.Lock()
-        return self._prompt_locks[chat_id]
+    def _chat_state(self, chat_id: int) -> _ChatState:
+        """Get or create the prompt state for a chat."""
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState()
+        return state
+
+    def _prompt_done(
+        self, chat_id: int, state: _ChatState, task: asyncio.Task[None]
+    ) -> None:
+        """Update chat state when a prompt task ends."""
+        if state.running is task:
+            state.running = None
+        state.pending -= 1
+        self._release_chat_state(chat_id, state)
+
+    def _release_chat_state(self, chat_id: int, state: _ChatState) -> None:
+        """Drop a chat's state once nothing is pending for it."""
+        if (
+            state.pending == 0
+            and state.voices == 0
+            and state.pending_rename is None
+            and self._chats.get(chat_id) is state
+        ):
+            del self._chats[chat_id]
+
+    async def _cancel(self, chat_id: int, *, wait: bool = True) -> bool:
+        """Cancel the running prompt for a chat.
+
+        Signals the prompt to stop; it discards its SDK client and updates
+        its "Working..." message itself.
+
+        Args:
+            chat_id: Telegram chat ID.
+            wait: Whether to wait for the prompt to finish. It is forced to
+                stop if it does not finish within _CANCEL_TIMEOUT.
+
+        Returns:
+            True if a running prompt was cancelled.
+        """
+        task = self._signal_cancel(chat_id)
+        if task is None:
+            return False
+        if wait:
+            await self._wait_stopped(task)
+        return True
+
+    def _signal_cancel(self, chat_id: int) -> asyncio.Task[None] | None:
+        """Signal the running prompt for a chat to stop.
+
+        Args:
+            chat_id: Telegram chat ID.
+
+        Returns:
+            The signalled prompt task, or None if no prompt is running.
+        """
+        state = self._chats.get(chat_id)
+        task = state.running if state else None
+        if state is None or task is None or task.done():
+            return None
+        state.cancel.set()
+        return task
+
+    @staticmethod
+    async def _wait_stopped(task: asyncio.Task[None]) -> None:
+        """Wait for a signalled prompt to stop, forcing it after a timeout."""
+        try:
+            await asyncio.wait_for(asyncio.shield(task), _CANCEL_TIMEOUT)
+        except TimeoutError:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _discard_client(self, chat_id: int) -> None:
+        """Close the SDK client after an interrupted response stream.
+
+        Otherwise the next query reads stale data from the old prompt.
+        """
+        with contextlib.suppress(Exception):
+            session = self.session_manager.get(chat_id)
+            if session:
+                await self.session_manager._close_client(session)
 
     async def _send_formatted(
         self,
         update: Update,
         text: str,
         chat_id: int | None = None,
-    ) -> None:
+        edit: Message | None = None,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        cache: bool = True,
+    ) -> Message | None:
         """Send a message with Telegram MarkdownV2 formatting.
 
         Sends directly to the chat rather than replying to the
         triggering message.  This avoids stale-reply ordering when
         messages are queued behind a lock.
 
-        Falls back to plain text if formatting fails.
+        Falls back to plain text if formatting fails. Text longer than one
+        message is split across several.
 
         Args:
             update: Telegram update (used for bot reference).
             text: Text to send (may contain Markdown).
             chat_id: Optional chat ID for session tag.
+            edit: Optional message to replace instead of sending a new one.
+            reply_markup: Optional keyboard to attach.
+            cache: Whether short text may use the formatting cache.
+
+        Returns:
+            The last message sent or edited, or None if there is no chat.
         """
         target_chat_id = chat_id or (
             update.effective_chat.id if update.effective_chat else None
         )
         if not target_chat_id:
-            return
+            return None
         if chat_id:
             tag = self._session_tag(chat_id)
             text = f"{tag} {text}"
         bot = update.get_bot()
+        parts = await _format_parts(text, cache)
+        for i, (part, formatted, parse_mode) in enumerate(parts):
+            # Only the first part replaces the edited message and carries
+            # the keyboard; the rest follow as new messages
+            if i:
+                edit, reply_markup = None, None
+            sent = await self._send_part(
+                bot, target_chat_id, part, formatted, parse_mode, edit, reply_markup
+            )
+        return sent
+
+    @staticmethod
+    async def _send_part(
+        bot: Bot,
+        chat_id: int,
+        text: str,
+        formatted: str,
+        parse_mode: str | None,
+        edit: Message | None,
+        reply_markup: InlineKeyboardMarkup | None,
+    ) -> Message:
+        """Send or edit one message, falling back to plain text on failure.
+
+        Args:
+            bot: Bot used to send new messages.
+            chat_id: Chat to send to.
+            text: Raw text of the part, sent as-is if formatting is rejected.
+            formatted: The part converted for parse_mode.
+            parse_mode: Telegram parse mode, or None for plain text.
+            edit: Optional message to replace instead of sending a new one.
+            reply_markup: Optional keyboard to attach.
+
+        Returns:
+            The edited or newly sent message.
+        """
         try:
-            formatted = convert_markdown_to_telegram(text)
-            await bot.send_message(
-                target_chat_id, formatted, parse_mode="MarkdownV2"
+            if edit is not None:
+                await edit.edit_text(
+                    formatted, parse_mode=parse_mode, reply_markup=reply_markup
+                )
+                return edit
+            return await bot.send_message(
+                chat_id,
+                formatted,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup,
             )
         except Exception as e:
+            if edit is not None and _is_not_modified(e):
+                return edit
             # Fall back to plain text if formatting fails
             logger.debug("Markdown formatting failed, falling back to plain: %s", e)
-            await bot.send_message(target_chat_id, text)
+            if edit is not None:
+                try:
+                    await edit.edit_text(text, reply_markup=reply_markup)
+                except BadRequest as plain_error:
+                    if not _is_not_modified(plain_error):
+                        raise
+                return edit
+            return await bot.send_message(chat_id, text, reply_markup=reply_markup)
 
-    _SESSION_FRUITS = ["🍎", "🍊", "🍋", "🍇", "🍉", "🍓", "🍑", "🍒", "🥝", "🍍"]
+    _SESSION_FRUITS = ("🍎", "🍊", "🍋", "🍇", "🍉", "🍓", "🍑", "🍒", "🥝", "🍍")
 
     def _session_tag(self, chat_id: int) -> str:
         """Get session indicator tag for messages."""
-        sessions = self.session_manager.list_sessions(chat_id)
-        active = self.session_manager.get_active_session_name(chat_id)
-        for i, s in enumerate(sessions):
-            if s.name == active:
-                return self._SESSION_FRUITS[i % len(self._SESSION_FRUITS)]
-        return self._SESSION_FRUITS[0]
+        index = self.session_manager.get_active_session_index(chat_id) or 0
+        return self._SESSION_FRUITS[index % len(self._SESSION_FRUITS)]
 
     async def unknown_command(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -996,10 +1580,32 @@ class VoiceAgentBot:
         if not text:
             return
 
-        # Delete the command message to keep chat clean
-        await update.message.delete()
+        # Delete the command message to keep chat clean, alongside queueing
+        # the prompt rather than before it
+        await asyncio.gather(
+            update.message.delete(), self._handle_prompt(chat_id, text, update)
+        )
 
-        await self._handle_prompt(chat_id, text, update)
+    async def _notify_permission(
+        self, bot: Bot, chat_id: int, tool_name: str, input_data: dict[str, Any]
+    ) -> None:
+        """Ask a chat to approve or reject a tool call.
+
+        Args:
+            bot: Bot used to send the request.
+            chat_id: Telegram chat ID.
+            tool_name: Name of the tool requesting permission.
+            input_data: Input parameters for the tool.
+        """
+        tag = self._session_tag(chat_id)
+        desc = f"{tag} Claude wants to use {tool_name}"
+        if tool_name == "Bash":
+            cmd = input_data.get("command", "unknown")
+            desc = f"{tag} Run: {cmd}"
+        elif tool_name in ("Write", "Edit"):
+            path = input_data.get("file_path", "unknown")
+            desc = f"{tag} Modify: {path}"
+        await bot.send_message(chat_id, desc, reply_markup=_PERMISSION_KEYBOARD)
 
     async def _handle_prompt(self, chat_id: int, text: str, update: Update) -> None:
         """Handle a prompt to send to Claude."""
@@ -1015,31 +1621,24 @@ class VoiceAgentBot:
         """Handle a prompt with optional images to send to Claude."""
         tag = self._session_tag(chat_id)
 
-        # Set up notification callback for this chat
-        async def notify_permission(tool_name: str, input_data: dict[str, Any]) -> None:
-            desc = f"{tag} Claude wants to use {tool_name}"
-            if tool_name == "Bash":
-                cmd = input_data.get("command", "unknown")
-                desc = f"{tag} Run: {cmd}"
-            elif tool_name in ("Write", "Edit"):
-                path = input_data.get("file_path", "unknown")
-                desc = f"{tag} Modify: {path}"
-            keyboard = InlineKeyboardMarkup(
-                [
-                    [
-                        InlineKeyboardButton("Approve", callback_data="approve"),
-                        InlineKeyboardButton("Always", callback_data="sticky_approve"),
-                        InlineKeyboardButton("Reject", callback_data="reject"),
-                    ]
-                ]
-            )
+        # Back-pressure: refuse new prompts while the chat's queue is full
+        state = self._chat_state(chat_id)
+        if state.pending >= _MAX_QUEUED_PROMPTS:
             await update.get_bot().send_message(
-                chat_id, desc, reply_markup=keyboard
+                chat_id, f"{tag} Too many queued prompts, try again later."
             )
+            return
 
-        self.session_manager.set_notify_callback(chat_id, notify_permission)
+        # Route permission requests to this chat; the callback is bound once
+        if not self.session_manager.has_notify_callback(chat_id):
+            self.session_manager.set_notify_callback(
+                chat_id,
+                functools.partial(self._notify_permission, update.get_bot(), chat_id),
+            )
 
-        lock = self._get_prompt_lock(chat_id)
+        state.pending += 1
+        lock = state.lock
+        cancel_event = state.cancel
         bot = update.get_bot()
 
         # Run prompt in background task so bot can still receive messages
@@ -1051,70 +1650,143 @@ class VoiceAgentBot:
                 )
             async with lock:
                 logger.info("Processing prompt for chat %s: %s", chat_id, text[:50])
-                self._cancel_flags[chat_id] = False
-                this_task = asyncio.current_task()
+                state.running = task
+                cancel_event.clear()
 
                 # Send "working" message with Stop button
-                stop_keyboard = InlineKeyboardMarkup(
-                    [[InlineKeyboardButton("🛑 Stop", callback_data="cancel")]]
-                )
                 working_msg = await bot.send_message(
                     chat_id,
                     f"{tag} ⏳ Working...",
-                    reply_markup=stop_keyboard,
+                    reply_markup=_STOP_KEYBOARD,
                 )
 
-                response_buffer: list[str] = []
+                # Output is appended to the "Working..." message, then to
+                # each message after it, and moves to a new message only
+                # once the current one would outgrow the flush size
+                # Buffered chunks are sent once the flush interval has passed
+                # since the last send, the stream has gone quiet for that
+                # long (e.g. during a tool run), or the buffer reaches the
+                # flush size
+                flush_interval = self.settings.stream_flush_interval
+                flush_chars = self.settings.stream_flush_chars
+                current_msg = working_msg
+                shown = ""
+                stop_attached = True
+                response_buffer = io.StringIO()
+                buffered_chars = 0
+                last_chunk: str | None = None
+                loop = asyncio.get_running_loop()
+                last_flush = loop.time()
+
+                async def flush(final: bool = False) -> None:
+                    nonlocal buffered_chars, current_msg, shown, stop_attached
+                    nonlocal last_flush
+                    pending = response_buffer.getvalue()
+                    response_buffer.seek(0)
+                    response_buffer.truncate()
+                    buffered_chars = 0
+                    if not pending.strip():
+                        # Nothing visible to add; Telegram would reject the
+                        # edit as unchanged
+                        return
+                    edit: Message | None = None
+                    combined = pending
+                    if not shown:
+                        edit = working_msg
+                    elif len(shown) + 1 + len(pending) <= flush_chars:
+                        # The session tag and escaping lengthen the raw
+                        # text, so check the edit still fits once formatted
+                        candidate = f"{shown}\n{pending}"
+                        tag = self._session_tag(chat_id)
+                        formatted, _ = await _to_markdown(
+                            f"{tag} {candidate}", cache=False
+                        )
+                        if len(formatted) <= _MESSAGE_MAX_CHARS:
+                            edit, combined = current_msg, candidate
+                    # Streamed text is seen once, so it skips the format cache
+                    if edit is working_msg and not final:
+                        # Keep the Stop button while output streams
+                        sent = await self._send_formatted(
+                            update,
+                            combined,
+                            chat_id,
+                            edit=edit,
+                            reply_markup=_STOP_KEYBOARD,
+                            cache=False,
+                        )
+                    else:
+                        sent = await self._send_formatted(
+                            update, combined, chat_id, edit=edit, cache=False
+                        )
+                        if edit is working_msg:
+                            stop_attached = False
+                    if edit is None and sent is not None:
+                        current_msg = sent
+                    shown = combined
+                    last_flush = loop.time()
+
                 try:
-                    async for chunk in self.session_manager.send_prompt(
-                        chat_id, text, images=images
+                    async for chunk in _until_cancelled(
+                        self.session_manager.send_prompt(chat_id, text, images=images),
+                        cancel_event,
+                        idle=flush_interval,
                     ):
-                        # Check if cancelled
-                        if self._cancel_flags.get(chat_id, False):
-                            logger.info("Task cancelled for chat %s", chat_id)
-                            break
-                        response_buffer.append(chunk)
-
-                        # Send in batches to avoid too many messages
-                        if len(response_buffer) >= 5:
-                            await self._send_formatted(
-                                update, "\n".join(response_buffer), chat_id
-                            )
-                            response_buffer = []
-
-                    # Send remaining
-                    if response_buffer and not self._cancel_flags.get(chat_id, False):
-                        await self._send_formatted(
-                            update, "\n".join(response_buffer), chat_id
-                        )
+                        if chunk is None:
+                            # Stream went quiet; show what has arrived so far
+                            if buffered_chars:
+                                await flush()
+                            continue
+
+                        # The SDK can repeat a text block verbatim, e.g. the
+                        # same preamble before consecutive tool calls
+                        if chunk == last_chunk:
+                            continue
+                        last_chunk = chunk
+
+                        # Chunks are newline-separated, without a trailing one
+                        if buffered_chars:
+                            response_buffer.write("\n")
+                            buffered_chars += 1
+                        response_buffer.write(chunk)
+                        buffered_chars += len(chunk)
+
+                        # Flush by time or size so output keeps appearing
+                        # without sending one message per chunk
+                        if (
+                            loop.time() - last_flush >= flush_interval
+                            or buffered_chars >= flush_chars
+                        ):
+                            await flush()
+
+                    if cancel_event.is_set():
+                        logger.info("Task cancelled for chat %s", chat_id)
+                        await self._discard_client(chat_id)
+                    elif buffered_chars:
+                        # Send remaining
+                        await flush(final=True)
                 except asyncio.CancelledError:
                     logger.info("Task cancelled for chat %s", chat_id)
-                    # Close SDK client to discard the interrupted response
-                    # stream — otherwise the next query reads stale data
-                    # from the old prompt
-                    with contextlib.suppress(Exception):
-                        session = self.session_manager.get(chat_id)
-                        if session:
-                            await self.session_manager._close_client(session)
+                    await self._discard_client(chat_id)
                 except Exception as e:
                     logger.exception("Error in background prompt for chat %s", chat_id)
                     await bot.send_message(chat_id, f"Error: {e}")
                 finally:
-                    was_cancelled = self._cancel_flags.get(chat_id, False)
-                    # Only clean up tracking if we're still the registered
-                    # task — a new message may have replaced us already
-                    if self._active_tasks.get(chat_id) is this_task:
-                        self._active_tasks.pop(chat_id, None)
-                        self._cancel_flags.pop(chat_id, None)
-                    # Update or remove the "Working..." message
+                    was_cancelled = cancel_event.is_set()
+                    # Update or remove the "Working..." message, or just drop
+                    # the Stop button if it already holds output
                     with contextlib.suppress(Exception):
-                        if was_cancelled:
-                            await working_msg.edit_text("⏹️ Task cancelled.")
-                        else:
-                            await working_msg.delete()
+                        if not shown:
+                            if was_cancelled:
+                                await working_msg.edit_text("⏹️ Task cancelled.")
+                            else:
+                                await working_msg.delete()
+                        elif stop_attached:
+                            await working_msg.edit_reply_markup(reply_markup=None)
+                            if was_cancelled:
+                                await bot.send_message(chat_id, "⏹️ Task cancelled.")
 
         task = asyncio.create_task(run_prompt())
-        self._active_tasks[chat_id] = task
+        task.add_done_callback(functools.partial(self._prompt_done, chat_id, state))
 
     def build_application(self) -> Application:  # type: ignore
         """Build the Telegram application.
@@ -1122,7 +1794,26 @@ class VoiceAgentBot:
         Returns:
             Configured Application instance.
         """
-        app = Application.builder().token(self.settings.telegram_bot_token).build()
+        # Process updates concurrently so one chat's slow download or
+        # transcription doesn't hold up others; prompts stay serialized per
+        # chat by the prompt locks. PTB's default pool (256) is ample, but
+        # its 1s pool timeout is short when many chats stream edits at once.
+        # Outgoing calls go through the rate limiter, which keeps streamed
+        # edits under Telegram's flood limits and retries on RetryAfter
+        # instead of dropping the message.
+        app = (
+            Application.builder()
+            .token(self.settings.telegram_bot_token)
+            .concurrent_updates(True)
+            .pool_timeout(_BOT_POOL_TIMEOUT)
+            .rate_limiter(AIORateLimiter(max_retries=_SEND_MAX_RETRIES))
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
+
+        # Drop updates from non-allowed chats before any other handler runs
+        if not self._no_whitelist:
+            app.add_handler(TypeHandler(Update, self._acl_gate), group=-1)
 
         # Add handlers
         app.add_handler(CommandHandler("start", self.start_command))
@@ -1143,7 +1834,28 @@ class VoiceAgentBot:
         return app
 
     def run(self) -> None:
-        """Run the bot with polling."""
+        """Run the bot with a webhook if configured, else with polling.
+
+        Webhooks let Telegram push updates as they happen instead of the
+        bot fetching them, but require the host to be reachable from
+        Telegram.
+        """
+        if self.settings.webhook_url and importlib.util.find_spec("tornado") is None:
+            raise RuntimeError(
+                "WEBHOOK_URL is set but webhook support is not installed; "
+                "install the webhooks extra: pip install 'voice-agent[webhooks]'"
+            )
         logger.info("Starting Voice Agent bot...")
         app = self.build_application()
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+        if self.settings.webhook_url:
+            url_path = "telegram"
+            app.run_webhook(
+                listen=self.settings.webhook_listen,
+                port=self.settings.webhook_port,
+                url_path=url_path,
+                webhook_url=f"{self.settings.webhook_url.rstrip('/')}/{url_path}",
+                secret_token=self.settings.webhook_secret or None,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        else:
+            app.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -3,6 +3,8 @@
 Loads settings from environment variables with validation.
 """
 
+import functools
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,10 +15,19 @@ class Settings(BaseSettings):
     Attributes:
         telegram_bot_token: Telegram Bot API token from @BotFather.
         whisper_url: URL of the whisper-server transcription endpoint.
+        whisper_concurrency: Maximum in-flight transcription requests.
+        min_voice_seconds: Voice notes shorter than this are not transcribed.
+        stream_flush_interval: Seconds between streamed output updates.
+        stream_flush_chars: Characters of streamed output per message.
         allowed_chat_ids: Comma-separated list of allowed Telegram chat IDs.
         default_cwd: Default working directory for Claude sessions.
         permission_timeout: Seconds to wait for permission approval.
+        max_live_clients: Claude clients kept running before idle ones close.
         projects: Mapping of project names to their working directories.
+        webhook_url: Public base URL for Telegram webhooks (empty: polling).
+        webhook_listen: Address the webhook server binds to.
+        webhook_port: Port the webhook server listens on.
+        webhook_secret: Secret token Telegram sends with webhook requests.
     """
 
     model_config = SettingsConfigDict(
@@ -32,6 +43,27 @@ class Settings(BaseSettings):
         default="http://localhost:8080/transcribe",
         description="URL of the whisper-server transcription endpoint",
     )
+    whisper_concurrency: int = Field(
+        default=2,
+        ge=1,
+        description="Maximum in-flight transcription requests",
+    )
+    min_voice_seconds: int = Field(
+        default=1,
+        ge=0,
+        description="Voice notes shorter than this are not transcribed",
+    )
+    stream_flush_interval: float = Field(
+        default=1.0,
+        gt=0,
+        description="Seconds between streamed output updates",
+    )
+    stream_flush_chars: int = Field(
+        default=3500,
+        ge=100,
+        le=4000,
+        description="Characters of streamed output per message",
+    )
     allowed_chat_ids: str = Field(
         default="",
         description="Comma-separated list of allowed Telegram chat IDs",
@@ -44,6 +76,11 @@ class Settings(BaseSettings):
         default=300,
         description="Seconds to wait for permission approval",
     )
+    max_live_clients: int = Field(
+        default=16,
+        ge=1,
+        description="Claude clients kept running before idle ones close",
+    )
     projects: dict[str, str] = Field(
         default_factory=dict,
         description="Mapping of project names to their working directories",
@@ -52,16 +89,41 @@ class Settings(BaseSettings):
         default="sessions.json",
         description="Path to the session storage file",
     )
+    webhook_url: str = Field(
+        default="",
+        description="Public base URL for Telegram webhooks; empty uses polling",
+    )
+    webhook_listen: str = Field(
+        default="0.0.0.0",
+        description="Address the webhook server binds to",
+    )
+    webhook_port: int = Field(
+        default=8443,
+        description="Port the webhook server listens on",
+    )
+    webhook_secret: str = Field(
+        default="",
+        description="Secret token Telegram sends with webhook requests",
+    )
 
-    def get_allowed_chat_ids(self) -> set[int]:
+    def get_allowed_chat_ids(self) -> frozenset[int]:
         """Parse allowed_chat_ids into a set of integers.
 
+        The result is cached per allowed_chat_ids string, so repeated calls
+        don't re-split and re-parse it.
+
         Returns:
-            Set of allowed Telegram chat IDs.
+            Frozen set of allowed Telegram chat IDs.
         """
-        if not self.allowed_chat_ids:
-            return set()
-        return {int(cid.strip()) for cid in self.allowed_chat_ids.split(",")}
+        return _parse_chat_ids(self.allowed_chat_ids)
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_chat_ids(chat_ids: str) -> frozenset[int]:
+    """Parse a comma-separated list of chat IDs."""
+    if not chat_ids:
+        return frozenset()
+    return frozenset(int(cid.strip()) for cid in chat_ids.split(","))
 
 
 def load_settings() -> Settings:
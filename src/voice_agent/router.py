@@ -3,6 +3,7 @@
 Parses intent from transcribed text and routes to appropriate handlers.
 """
 
+import re
 from dataclasses import dataclass
 from enum import Enum, auto
 
@@ -25,7 +26,7 @@ class CommandType(Enum):
     PROMPT = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedCommand:
     """Result of parsing a voice transcription.
 
@@ -118,6 +119,40 @@ SESSIONS_KEYWORDS = frozenset(
 )
 
 
+def _keyword_pattern(keywords: frozenset[str]) -> re.Pattern[str]:
+    """Compile keywords into one pattern matching any of them as a substring.
+
+    Args:
+        keywords: Keywords to search for.
+
+    Returns:
+        Compiled alternation of the escaped keywords.
+    """
+    return re.compile("|".join(map(re.escape, sorted(keywords))))
+
+
+# Keyword sets matched only as the whole text (restart and resume are exact
+# to avoid false positives), merged into one lookup. None of these phrases
+# contains a substring keyword below, so checking them first keeps the
+# original precedence.
+_EXACT_COMMANDS: dict[str, CommandType] = {
+    **dict.fromkeys(APPROVE_KEYWORDS, CommandType.APPROVE),
+    **dict.fromkeys(REJECT_KEYWORDS, CommandType.REJECT),
+    **dict.fromkeys(CLEAR_KEYWORDS, CommandType.CLEAR),
+    **dict.fromkeys(RESTART_KEYWORDS, CommandType.RESTART),
+    **dict.fromkeys(RESUME_KEYWORDS, CommandType.RESUME),
+}
+
+# Keyword sets matched anywhere in the text, each scanned in a single
+# regex search instead of one substring test per keyword
+_STATUS_PATTERN = _keyword_pattern(STATUS_KEYWORDS)
+_STICKY_APPROVE_PATTERN = _keyword_pattern(STICKY_APPROVE_KEYWORDS)
+_CLEAR_STICKY_PATTERN = _keyword_pattern(CLEAR_STICKY_KEYWORDS)
+_LIST_APPROVALS_PATTERN = _keyword_pattern(LIST_APPROVALS_KEYWORDS)
+_CANCEL_PATTERN = _keyword_pattern(CANCEL_KEYWORDS)
+_SESSIONS_PATTERN = _keyword_pattern(SESSIONS_KEYWORDS)
+
+
 def parse_command(text: str, projects: dict[str, str] | None = None) -> ParsedCommand:
     """Parse a voice transcription into a command.
 
@@ -128,64 +163,46 @@ def parse_command(text: str, projects: dict[str, str] | None = None) -> ParsedCo
     Returns:
         ParsedCommand with detected intent.
     """
-    # Strip punctuation and whitespace for matching
-    lower_text = text.lower().strip().rstrip(".,!?")
-
-    # Check for exact or near-exact matches first
-    if lower_text in APPROVE_KEYWORDS:
-        return ParsedCommand(command_type=CommandType.APPROVE, text=text)
+    # Strip whitespace and trailing punctuation for matching; stripping
+    # returns the same string when there is nothing to remove, so lowering
+    # last makes the one copy of the trimmed text
+    lower_text = text.strip().rstrip(".,!?").lower()
 
-    if lower_text in REJECT_KEYWORDS:
-        return ParsedCommand(command_type=CommandType.REJECT, text=text)
+    # Check for exact matches first
+    command_type = _EXACT_COMMANDS.get(lower_text)
+    if command_type is not None:
+        return ParsedCommand(command_type=command_type, text=text)
 
     # Check for status keywords
-    for keyword in STATUS_KEYWORDS:
-        if keyword in lower_text:
-            return ParsedCommand(command_type=CommandType.STATUS, text=text)
-
-    # Check for clear context keywords (exact match)
-    if lower_text in CLEAR_KEYWORDS:
-        return ParsedCommand(command_type=CommandType.CLEAR, text=text)
+    if _STATUS_PATTERN.search(lower_text):
+        return ParsedCommand(command_type=CommandType.STATUS, text=text)
 
     # Check for sticky approve keywords
-    for keyword in STICKY_APPROVE_KEYWORDS:
-        if keyword in lower_text:
-            return ParsedCommand(command_type=CommandType.STICKY_APPROVE, text=text)
+    if _STICKY_APPROVE_PATTERN.search(lower_text):
+        return ParsedCommand(command_type=CommandType.STICKY_APPROVE, text=text)
 
     # Check for clear sticky keywords
-    for keyword in CLEAR_STICKY_KEYWORDS:
-        if keyword in lower_text:
-            return ParsedCommand(command_type=CommandType.CLEAR_STICKY, text=text)
+    if _CLEAR_STICKY_PATTERN.search(lower_text):
+        return ParsedCommand(command_type=CommandType.CLEAR_STICKY, text=text)
 
     # Check for list approvals keywords
-    for keyword in LIST_APPROVALS_KEYWORDS:
-        if keyword in lower_text:
-            return ParsedCommand(command_type=CommandType.LIST_APPROVALS, text=text)
+    if _LIST_APPROVALS_PATTERN.search(lower_text):
+        return ParsedCommand(command_type=CommandType.LIST_APPROVALS, text=text)
 
     # Check for cancel/escape keywords
-    for keyword in CANCEL_KEYWORDS:
-        if keyword in lower_text:
-            return ParsedCommand(command_type=CommandType.CANCEL, text=text)
-
-    # Check for restart keywords (exact match to avoid false positives)
-    if lower_text in RESTART_KEYWORDS:
-        return ParsedCommand(command_type=CommandType.RESTART, text=text)
-
-    # Check for resume keywords (exact match)
-    if lower_text in RESUME_KEYWORDS:
-        return ParsedCommand(command_type=CommandType.RESUME, text=text)
+    if _CANCEL_PATTERN.search(lower_text):
+        return ParsedCommand(command_type=CommandType.CANCEL, text=text)
 
     # Check for sessions keywords
-    for keyword in SESSIONS_KEYWORDS:
-        if keyword in lower_text:
-            return ParsedCommand(command_type=CommandType.SESSIONS, text=text)
+    if _SESSIONS_PATTERN.search(lower_text):
+        return ParsedCommand(command_type=CommandType.SESSIONS, text=text)
 
     # Check for project switch commands
     if projects:
         # Check for "on PROJECT: command" format first
         if lower_text.startswith("on ") and ":" in lower_text:
             parts = lower_text.split(":", 1)
-            project_part = parts[0][3:].strip()
+            project_part = parts[0].removeprefix("on ").strip()
             for name in projects:
                 if name in project_part or project_part in name:
                     return ParsedCommand(
@@ -196,7 +213,7 @@ def parse_command(text: str, projects: dict[str, str] | None = None) -> ParsedCo
 
         for prefix in ("work on ", "switch to ", "on "):
             if lower_text.startswith(prefix):
-                project_name = lower_text[len(prefix) :].strip().rstrip(":")
+                project_name = lower_text.removeprefix(prefix).strip().rstrip(":")
                 if project_name in projects:
                     return ParsedCommand(
                         command_type=CommandType.SWITCH_PROJECT,
@@ -214,7 +231,7 @@ def parse_command(text: str, projects: dict[str, str] | None = None) -> ParsedCo
 
     # Check for skill invocation: "skill X" -> "/X"
     if lower_text.startswith("skill "):
-        skill_name = lower_text[6:].strip()
+        skill_name = lower_text.removeprefix("skill ").strip()
         if skill_name:
             return ParsedCommand(
                 command_type=CommandType.PROMPT, text=f"/{skill_name}"
@@ -4,7 +4,11 @@ Manages Claude SDK client instances and their lifecycle.
 """
 
 import asyncio
+import functools
 import logging
+import shutil
+import time
+from collections import OrderedDict, deque
 from collections.abc import AsyncIterator
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -12,6 +16,7 @@ from typing import TYPE_CHECKING, Any
 
 from voice_agent.sessions.image import ImageAttachment
 from voice_agent.sessions.permissions import PermissionHandler
+from voice_agent.sessions.storage import StoredSession
 
 if TYPE_CHECKING:
     from claude_agent_sdk import ClaudeSDKClient
@@ -21,7 +26,7 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class Session:
     """A Claude Code session.
 
@@ -44,6 +49,13 @@ class Session:
     permission_handler: PermissionHandler = field(default_factory=PermissionHandler)
     sdk_client: "ClaudeSDKClient | None" = None
     claude_session_id: str | None = None
+    _stored: StoredSession | None = field(default=None, repr=False, compare=False)
+    _created_monotonic: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Anchor created_at to the monotonic clock for cheap age checks."""
+        age = (datetime.now() - self.created_at).total_seconds()
+        self._created_monotonic = time.monotonic() - age
 
     def get_status(self) -> str:
         """Get a human-readable status of this session.
@@ -51,9 +63,9 @@ class Session:
         Returns:
             Status string.
         """
-        age = datetime.now() - self.created_at
-        hours, remainder = divmod(int(age.total_seconds()), 3600)
-        minutes, _ = divmod(remainder, 60)
+        age = int(time.monotonic() - self._created_monotonic)
+        hours, remainder = divmod(age, 3600)
+        minutes = remainder // 60
 
         status_parts = [
             f"Session: {self.name}",
@@ -75,7 +87,7 @@ class Session:
         return "\n".join(status_parts)
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionInfo:
     """Summary info for a session, used in listings.
 
@@ -101,6 +113,7 @@ class SessionManager:
         default_cwd: Default working directory for new sessions.
         permission_timeout: Timeout for permission requests.
         storage: Optional persistent storage for sessions.
+        max_live_clients: Number of SDK clients kept open across all sessions.
     """
 
     def __init__(
@@ -108,6 +121,7 @@ class SessionManager:
         default_cwd: str = "/code",
         permission_timeout: int = 300,
         storage: "SessionStorage | None" = None,
+        max_live_clients: int = 16,
     ) -> None:
         """Initialize the session manager.
 
@@ -115,12 +129,31 @@ class SessionManager:
             default_cwd: Default working directory for new sessions.
             permission_timeout: Timeout in seconds for permission requests.
             storage: Optional storage for session persistence.
+            max_live_clients: Open SDK clients allowed before the least
+                recently used idle one is closed.
         """
         self.sessions: dict[int, dict[str, Session]] = {}
         self.active_sessions: dict[int, str] = {}
+        # chat_id -> active Session, kept in step with active_sessions
+        self._active_ref: dict[int, Session] = {}
+        # chat_id -> position of the active session in sessions[chat_id]
+        self._active_index: dict[int, int] = {}
+        # chat_id -> session names, most recently used first
+        self._session_order: dict[int, deque[str]] = {}
+        # chat_id -> next number to try in generate_session_name
+        self._next_session_num: dict[int, int] = {}
+        # Background client closes started by the synchronous API
+        self._pending_closes: set[asyncio.Task[None]] = set()
+        # Path to the system Claude CLI, looked up on first client creation
+        self._cli_path: str | None = None
+        # id(session) -> Session with an open SDK client, least recent first
+        self._live_clients: OrderedDict[int, Session] = OrderedDict()
+        # id(session) of sessions currently streaming a prompt
+        self._busy: set[int] = set()
         self.default_cwd = default_cwd
         self.permission_timeout = permission_timeout
         self.storage = storage
+        self.max_live_clients = max_live_clients
         self._notify_callbacks: dict[int, Any] = {}
         self._restore_sessions()
 
@@ -152,26 +185,76 @@ class SessionManager:
                     claude_session_id=stored.claude_session_id,
                     permission_handler=PermissionHandler(
                         timeout=self.permission_timeout,
-                        notify_callback=self._notify_callbacks.get(stored.chat_id),
+                        notify_callback=functools.partial(self._notify, stored.chat_id),
                     ),
+                    _stored=stored,
                 )
                 self.sessions[chat_id][stored.name] = session
+            self._session_order[chat_id] = deque(self.sessions[chat_id])
+            if state.active_session in self.sessions[chat_id]:
+                self._touch_session(chat_id, state.active_session)
+            self._refresh_active_ref(chat_id)
+
+    def _refresh_active_ref(self, chat_id: int) -> None:
+        """Re-point the cached active session and its index for a chat.
+
+        Called whenever the active session or the chat's session order changes.
+
+        Args:
+            chat_id: Telegram chat ID.
+        """
+        chat_sessions = self.sessions.get(chat_id)
+        active = self._get_active_session_name(chat_id)
+        if chat_sessions is None or active not in chat_sessions:
+            self._active_ref.pop(chat_id, None)
+            self._active_index.pop(chat_id, None)
+        else:
+            self._active_ref[chat_id] = chat_sessions[active]
+            self._active_index[chat_id] = list(chat_sessions).index(active)
+
+    def _touch_session(self, chat_id: int, name: str) -> None:
+        """Move a session to the front of the chat's most-recently-used order.
+
+        Args:
+            chat_id: Telegram chat ID.
+            name: Session name.
+        """
+        order = self._session_order.get(chat_id)
+        if order is None:
+            order = self._session_order[chat_id] = deque()
+        elif name in order:
+            order.remove(name)
+        order.appendleft(name)
 
     def _persist_session(self, session: Session) -> None:
         """Persist a session to storage."""
         if not self.storage:
             return
 
-        from voice_agent.sessions.storage import StoredSession
-
-        stored = StoredSession(
-            chat_id=session.chat_id,
-            name=session.name,
-            cwd=session.cwd,
-            created_at=session.created_at.isoformat(),
-            message_count=session.message_count,
-            claude_session_id=session.claude_session_id,
-        )
+        stored = session._stored
+        if stored is None:
+            stored = StoredSession(
+                chat_id=session.chat_id,
+                name=session.name,
+                cwd=session.cwd,
+                created_at=session.created_at.isoformat(),
+                message_count=session.message_count,
+                claude_session_id=session.claude_session_id,
+            )
+            session._stored = stored
+        elif (
+            stored.name == session.name
+            and stored.cwd == session.cwd
+            and stored.message_count == session.message_count
+            and stored.claude_session_id == session.claude_session_id
+        ):
+            # Already on disk as-is
+            return
+        else:
+            stored.name = session.name
+            stored.cwd = session.cwd
+            stored.message_count = session.message_count
+            stored.claude_session_id = session.claude_session_id
         self.storage.save(stored)
 
     def set_notify_callback(self, chat_id: int, callback: Any) -> None:
@@ -182,10 +265,34 @@ class SessionManager:
             callback: Async function to call for notifications.
         """
         self._notify_callbacks[chat_id] = callback
-        # Also update existing session's permission handler
-        if chat_id in self.sessions:
-            for session in self.sessions[chat_id].values():
-                session.permission_handler.notify_callback = callback
+
+    async def _notify(
+        self, chat_id: int, tool_name: str, input_data: dict[str, Any]
+    ) -> None:
+        """Forward a permission request to the chat's current callback.
+
+        Every session's permission handler is bound to this, so replacing
+        the callback in _notify_callbacks reaches all of a chat's sessions.
+
+        Args:
+            chat_id: Telegram chat ID.
+            tool_name: Name of the tool requesting permission.
+            input_data: Tool input parameters.
+        """
+        callback = self._notify_callbacks.get(chat_id)
+        if callback is not None:
+            await callback(tool_name, input_data)
+
+    def has_notify_callback(self, chat_id: int) -> bool:
+        """Check whether a notification callback is set for a chat.
+
+        Args:
+            chat_id: Telegram chat ID.
+
+        Returns:
+            True if set_notify_callback was called for the chat.
+        """
+        return chat_id in self._notify_callbacks
 
     def _get_active_session_name(self, chat_id: int) -> str:
         """Get the active session name for a chat.
@@ -211,32 +318,45 @@ class SessionManager:
         Returns:
             The session for this chat.
         """
-        if chat_id not in self.sessions:
-            self.sessions[chat_id] = {}
+        if not name:
+            active = self._active_ref.get(chat_id)
+            if active is not None:
+                return active
+
+        chat_sessions = self.sessions.get(chat_id)
+        if chat_sessions is None:
+            chat_sessions = self.sessions[chat_id] = {}
             self.active_sessions[chat_id] = "main"
 
         session_name = name or self._get_active_session_name(chat_id)
 
-        if session_name not in self.sessions[chat_id]:
-            effective_cwd = cwd or self.default_cwd
-            session = Session(
-                chat_id=chat_id,
-                name=session_name,
-                cwd=effective_cwd,
-                permission_handler=PermissionHandler(
-                    timeout=self.permission_timeout,
-                    notify_callback=self._notify_callbacks.get(chat_id),
-                ),
-            )
-            self.sessions[chat_id][session_name] = session
-            self._persist_session(session)
-            # If creating the active session name, ensure it's set
-            if session_name == self._get_active_session_name(chat_id):
-                self.active_sessions[chat_id] = session_name
-                if self.storage:
-                    self.storage.set_active_session(chat_id, session_name)
+        existing = chat_sessions.get(session_name)
+        if existing is not None:
+            return existing
+
+        effective_cwd = cwd or self.default_cwd
+        session = Session(
+            chat_id=chat_id,
+            name=session_name,
+            cwd=effective_cwd,
+            permission_handler=PermissionHandler(
+                timeout=self.permission_timeout,
+                notify_callback=functools.partial(self._notify, chat_id),
+            ),
+        )
+        chat_sessions[session_name] = session
+        self._persist_session(session)
+        # If creating the active session name, ensure it's set
+        if session_name == self._get_active_session_name(chat_id):
+            self._touch_session(chat_id, session_name)
+            self.active_sessions[chat_id] = session_name
+            self._refresh_active_ref(chat_id)
+            if self.storage:
+                self.storage.set_active_session(chat_id, session_name)
+        else:
+            self._session_order.setdefault(chat_id, deque()).append(session_name)
 
-        return self.sessions[chat_id][session_name]
+        return session
 
     async def create_new_async(
         self, chat_id: int, cwd: str | None = None, name: str | None = None
@@ -251,15 +371,16 @@ class SessionManager:
         Returns:
             The new session.
         """
-        if chat_id not in self.sessions:
-            self.sessions[chat_id] = {}
+        chat_sessions = self.sessions.get(chat_id)
+        if chat_sessions is None:
+            chat_sessions = self.sessions[chat_id] = {}
             self.active_sessions[chat_id] = "main"
 
         session_name = name or "main"
 
         # Clean up old session if exists
-        if session_name in self.sessions.get(chat_id, {}):
-            old_session = self.sessions[chat_id][session_name]
+        old_session = chat_sessions.get(session_name)
+        if old_session is not None:
             await self._close_client(old_session)
 
         effective_cwd = cwd or self.default_cwd
@@ -269,11 +390,13 @@ class SessionManager:
             cwd=effective_cwd,
             permission_handler=PermissionHandler(
                 timeout=self.permission_timeout,
-                notify_callback=self._notify_callbacks.get(chat_id),
+                notify_callback=functools.partial(self._notify, chat_id),
             ),
         )
-        self.sessions[chat_id][session_name] = session
+        chat_sessions[session_name] = session
+        self._touch_session(chat_id, session_name)
         self.active_sessions[chat_id] = session_name
+        self._refresh_active_ref(chat_id)
         self._persist_session(session)
         if self.storage:
             self.storage.set_active_session(chat_id, session_name)
@@ -292,17 +415,17 @@ class SessionManager:
         Returns:
             The new session.
         """
-        if chat_id not in self.sessions:
-            self.sessions[chat_id] = {}
+        chat_sessions = self.sessions.get(chat_id)
+        if chat_sessions is None:
+            chat_sessions = self.sessions[chat_id] = {}
             self.active_sessions[chat_id] = "main"
 
         session_name = name or "main"
 
         # Clean up old session if exists
-        if session_name in self.sessions.get(chat_id, {}):
-            old_session = self.sessions[chat_id][session_name]
-            if old_session.sdk_client is not None:
-                asyncio.create_task(self._close_client(old_session))
+        old_session = chat_sessions.get(session_name)
+        if old_session is not None and old_session.sdk_client is not None:
+            self._spawn_close(old_session)
 
         effective_cwd = cwd or self.default_cwd
         session = Session(
@@ -311,11 +434,13 @@ class SessionManager:
             cwd=effective_cwd,
             permission_handler=PermissionHandler(
                 timeout=self.permission_timeout,
-                notify_callback=self._notify_callbacks.get(chat_id),
+                notify_callback=functools.partial(self._notify, chat_id),
             ),
         )
-        self.sessions[chat_id][session_name] = session
+        chat_sessions[session_name] = session
+        self._touch_session(chat_id, session_name)
         self.active_sessions[chat_id] = session_name
+        self._refresh_active_ref(chat_id)
         self._persist_session(session)
         if self.storage:
             self.storage.set_active_session(chat_id, session_name)
@@ -331,11 +456,14 @@ class SessionManager:
         Returns:
             Session or None.
         """
-        if chat_id not in self.sessions:
+        if not name:
+            return self._active_ref.get(chat_id)
+
+        chat_sessions = self.sessions.get(chat_id)
+        if chat_sessions is None:
             return None
 
-        session_name = name or self._get_active_session_name(chat_id)
-        return self.sessions[chat_id].get(session_name)
+        return chat_sessions.get(name)
 
     def list_sessions(self, chat_id: int) -> list[SessionInfo]:
         """List all sessions for a chat.
@@ -346,20 +474,41 @@ class SessionManager:
         Returns:
             List of SessionInfo objects.
         """
-        if chat_id not in self.sessions:
+        chat_sessions = self.sessions.get(chat_id)
+        if chat_sessions is None:
             return []
 
-        active = self._get_active_session_name(chat_id)
+        active = self._active_ref.get(chat_id)
         return [
             SessionInfo(
                 name=session.name,
                 message_count=session.message_count,
                 cwd=session.cwd,
-                is_active=session.name == active,
+                is_active=session is active,
             )
-            for session in self.sessions[chat_id].values()
+            for session in chat_sessions.values()
         ]
 
+    def get_session_info(self, chat_id: int, name: str) -> SessionInfo | None:
+        """Get summary info for a single named session.
+
+        Args:
+            chat_id: Telegram chat ID.
+            name: Session name.
+
+        Returns:
+            SessionInfo, or None if the chat has no session with that name.
+        """
+        session = self.get(chat_id, name)
+        if session is None:
+            return None
+        return SessionInfo(
+            name=session.name,
+            message_count=session.message_count,
+            cwd=session.cwd,
+            is_active=session is self._active_ref.get(chat_id),
+        )
+
     def get_active_session_name(self, chat_id: int) -> str | None:
         """Get the name of the active session.
 
@@ -373,6 +522,18 @@ class SessionManager:
             return None
         return self._get_active_session_name(chat_id)
 
+    def get_active_session_index(self, chat_id: int) -> int | None:
+        """Get the position of the active session in the chat's session list.
+
+        Args:
+            chat_id: Telegram chat ID.
+
+        Returns:
+            Index matching list_sessions() order, or None if there is no
+            active session.
+        """
+        return self._active_index.get(chat_id)
+
     def switch_session(self, chat_id: int, name: str) -> Session | None:
         """Switch to a different session.
 
@@ -383,16 +544,16 @@ class SessionManager:
         Returns:
             The switched-to session, or None if not found.
         """
-        if chat_id not in self.sessions:
-            return None
-
-        if name not in self.sessions[chat_id]:
+        session = self.sessions.get(chat_id, {}).get(name)
+        if session is None:
             return None
 
+        self._touch_session(chat_id, name)
         self.active_sessions[chat_id] = name
+        self._refresh_active_ref(chat_id)
         if self.storage:
             self.storage.set_active_session(chat_id, name)
-        return self.sessions[chat_id][name]
+        return session
 
     def generate_session_name(self, chat_id: int) -> str:
         """Generate a unique session name for a chat.
@@ -403,13 +564,11 @@ class SessionManager:
         Returns:
             A unique session name like "session-2", "session-3", etc.
         """
-        if chat_id not in self.sessions:
-            return "session-2"
-
-        existing = set(self.sessions[chat_id].keys())
-        counter = 2
-        while f"session-{counter}" in existing:
+        chat_sessions = self.sessions.get(chat_id, {})
+        counter = self._next_session_num.get(chat_id, 2)
+        while f"session-{counter}" in chat_sessions:
             counter += 1
+        self._next_session_num[chat_id] = counter + 1
         return f"session-{counter}"
 
     def rename_session(self, chat_id: int, old_name: str, new_name: str) -> bool:
@@ -435,9 +594,12 @@ class SessionManager:
         session = self.sessions[chat_id].pop(old_name)
         session.name = new_name
         self.sessions[chat_id][new_name] = session
+        order = self._session_order[chat_id]
+        order[order.index(old_name)] = new_name
 
         if self.active_sessions.get(chat_id) == old_name:
             self.active_sessions[chat_id] = new_name
+        self._refresh_active_ref(chat_id)
 
         if self.storage:
             self.storage.rename_session(chat_id, old_name, new_name)
@@ -469,8 +631,6 @@ class SessionManager:
             ClaudeSDKClient instance.
         """
         if session.sdk_client is None:
-            import shutil
-
             from claude_agent_sdk import (
                 ClaudeAgentOptions,
                 ClaudeSDKClient,
@@ -480,8 +640,11 @@ class SessionManager:
             )
 
             # Use system Claude CLI (2.0+) instead of bundled SDK version (1.3.5)
-            # The SDK's bundled CLI is too old and lacks required features
-            cli_path = shutil.which("claude")
+            # The SDK's bundled CLI is too old and lacks required features.
+            # Resolved once per manager to avoid a PATH walk per new session.
+            if self._cli_path is None:
+                self._cli_path = shutil.which("claude")
+            cli_path = self._cli_path
 
             async def permission_callback(
                 tool_name: str,
@@ -508,6 +671,7 @@ class SessionManager:
                 # Resume prior conversation if we have a stored session ID
                 resume=session.claude_session_id,
             )
+            await self._evict_idle_clients()
             session.sdk_client = ClaudeSDKClient(options=options)
             await session.sdk_client.__aenter__()
             logger.info(
@@ -517,14 +681,39 @@ class SessionManager:
                 cli_path,
             )
 
+        # Re-insert so the session becomes the most recently used
+        self._live_clients.pop(id(session), None)
+        self._live_clients[id(session)] = session
         return session.sdk_client
 
+    async def _evict_idle_clients(self) -> None:
+        """Close least recently used idle clients to make room for a new one.
+
+        Sessions in the middle of a prompt are skipped, so the cap can be
+        exceeded briefly while every open client is busy. Evicted sessions
+        keep their claude_session_id and resume on their next prompt.
+        """
+        excess = len(self._live_clients) - self.max_live_clients + 1
+        for key, session in list(self._live_clients.items()):
+            if excess <= 0:
+                break
+            if key in self._busy:
+                continue
+            logger.info(
+                "Closing idle SDK client for chat %s session %s",
+                session.chat_id,
+                session.name,
+            )
+            await self._close_client(session)
+            excess -= 1
+
     async def _close_client(self, session: Session) -> None:
         """Close the SDK client for a session.
 
         Args:
             session: The session whose client to close.
         """
+        self._live_clients.pop(id(session), None)
         if session.sdk_client is not None:
             client = session.sdk_client
             session.sdk_client = None
@@ -542,6 +731,20 @@ class SessionManager:
             except Exception as e:
                 logger.warning("Error terminating SDK client: %s", e)
 
+    def _spawn_close(self, session: Session) -> None:
+        """Close a session's client in the background, keeping the task alive.
+
+        Args:
+            session: Session whose client should be closed.
+        """
+        task = asyncio.create_task(self._close_client(session))
+        self._pending_closes.add(task)
+        task.add_done_callback(self._pending_closes.discard)
+
+    async def shutdown(self) -> None:
+        """Wait for background client closes to finish."""
+        await asyncio.gather(*self._pending_closes, return_exceptions=True)
+
     def _build_multimodal_message(
         self,
         prompt: str,
@@ -599,6 +802,7 @@ class SessionManager:
 
         session = self.get_or_create(chat_id)
         session.message_count += 1
+        self._busy.add(id(session))
 
         try:
             client = await self._get_or_create_client(session)
@@ -615,9 +819,10 @@ class SessionManager:
 
             async for msg in client.receive_response():
                 if isinstance(msg, AssistantMessage):
-                    for block in msg.content:
-                        if isinstance(block, TextBlock):
-                            yield block.text
+                    # One chunk per message; the bot newline-separates chunks
+                    parts = [b.text for b in msg.content if isinstance(b, TextBlock)]
+                    if parts:
+                        yield "\n".join(parts)
                 elif isinstance(msg, ResultMessage):
                     if msg.session_id and msg.session_id != session.claude_session_id:
                         session.claude_session_id = msg.session_id
@@ -645,6 +850,8 @@ class SessionManager:
             yield f"Error: {e}"
             # Close client on error so it can be recreated
             await self._close_client(session)
+        finally:
+            self._busy.discard(id(session))
 
     def get_status(self, chat_id: int) -> str | None:
         """Get status of the active session.
@@ -680,20 +887,26 @@ class SessionManager:
         await self._close_client(session)
 
         del self.sessions[chat_id][name]
+        order = self._session_order[chat_id]
+        order.remove(name)
 
         if self.storage:
             self.storage.delete_session(chat_id, name)
 
-        # Update active session if we closed the active one
+        # Update active session if we closed the active one, falling back
+        # to the most recently used of the rest
         if self.active_sessions.get(chat_id) == name:
-            if self.sessions[chat_id]:
-                new_active = next(iter(self.sessions[chat_id]))
+            if order:
+                new_active = order[0]
                 self.active_sessions[chat_id] = new_active
                 if self.storage:
                     self.storage.set_active_session(chat_id, new_active)
             else:
                 del self.sessions[chat_id]
                 del self.active_sessions[chat_id]
+                del self._session_order[chat_id]
+                self._next_session_num.pop(chat_id, None)
+        self._refresh_active_ref(chat_id)
 
         return True
 
@@ -715,23 +928,29 @@ class SessionManager:
 
         session = self.sessions[chat_id][name]
         if session.sdk_client is not None:
-            asyncio.create_task(self._close_client(session))
+            self._spawn_close(session)
 
         del self.sessions[chat_id][name]
+        order = self._session_order[chat_id]
+        order.remove(name)
 
         if self.storage:
             self.storage.delete_session(chat_id, name)
 
-        # Update active session if we closed the active one
+        # Update active session if we closed the active one, falling back
+        # to the most recently used of the rest
         if self.active_sessions.get(chat_id) == name:
-            if self.sessions[chat_id]:
-                new_active = next(iter(self.sessions[chat_id]))
+            if order:
+                new_active = order[0]
                 self.active_sessions[chat_id] = new_active
                 if self.storage:
                     self.storage.set_active_session(chat_id, new_active)
             else:
                 del self.sessions[chat_id]
                 del self.active_sessions[chat_id]
+                del self._session_order[chat_id]
+                self._next_session_num.pop(chat_id, None)
+        self._refresh_active_ref(chat_id)
 
         return True
 
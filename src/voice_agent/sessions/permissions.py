@@ -28,7 +28,7 @@ TOOL_FIELD_NAMES: dict[str, str] = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class StickyApproval:
     """A sticky approval rule that auto-approves matching tool calls.
 
@@ -80,7 +80,7 @@ class StickyApproval:
         return f"all {self.tool_name}"
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingPermission:
     """A permission request waiting for user approval.
 
@@ -3,11 +3,15 @@
 Stores session metadata to JSON file.
 """
 
+import asyncio
 import json
 from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any
 
+# Writes made within this many seconds of each other share one disk write
+_SAVE_DELAY = 0.1
+
 
 @dataclass
 class StoredSession:
@@ -101,6 +105,7 @@ class SessionStorage:
         """
         self.path = Path(path)
         self._data: dict[int, ChatStoredState] = {}
+        self._save_handle: asyncio.TimerHandle | None = None
         self._load()
 
     def _is_old_format(self, data: dict[str, Any]) -> bool:
@@ -159,7 +164,30 @@ class SessionStorage:
             self._data = {}
 
     def _save(self) -> None:
-        """Save sessions to disk."""
+        """Save sessions to disk.
+
+        Inside a running event loop the write is deferred by _SAVE_DELAY so
+        a burst of mutations costs a single write; call flush() to force it.
+        Without a loop the write happens immediately.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(_SAVE_DELAY, self.flush)
+
+    def flush(self) -> None:
+        """Write any deferred changes to disk now."""
+        if self._save_handle is None:
+            return
+        self._save_handle.cancel()
+        self._save_handle = None
+        self._write()
+
+    def _write(self) -> None:
+        """Write all sessions to the JSON file."""
         raw = {str(k): v.to_dict() for k, v in self._data.items()}
         with open(self.path, "w") as f:
             json.dump(raw, f, indent=2)
@@ -3,6 +3,9 @@
 Sends audio data to whisper-server and returns transcription text.
 """
 
+import contextlib
+from typing import BinaryIO
+
 import httpx
 
 
@@ -11,16 +14,20 @@ class TranscriptionError(Exception):
 
 
 async def transcribe(
-    audio_data: bytes,
+    audio_data: bytes | BinaryIO,
     whisper_url: str,
     timeout: float = 60.0,
+    client: httpx.AsyncClient | None = None,
 ) -> str:
     """Transcribe audio data using whisper-server.
 
     Args:
-        audio_data: Raw audio bytes (e.g., .oga format from Telegram).
+        audio_data: Raw audio bytes or a binary file object to stream from
+            (e.g., .oga format from Telegram).
         whisper_url: URL of the whisper-server /transcribe endpoint.
         timeout: Request timeout in seconds.
+        client: Optional shared HTTP client to reuse pooled connections.
+            A temporary client is created when not given.
 
     Returns:
         Transcribed text from the audio.
@@ -29,10 +36,15 @@ async def transcribe(
         TranscriptionError: If the request fails or transcription is empty.
     """
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        async with contextlib.AsyncExitStack() as stack:
+            if client is None:
+                client = await stack.enter_async_context(
+                    httpx.AsyncClient(timeout=timeout)
+                )
             response = await client.post(
                 whisper_url,
                 files={"audio": ("audio.oga", audio_data, "audio/ogg")},
+                timeout=timeout,
             )
             response.raise_for_status()
 
@@ -45,6 +45,7 @@ def mock_telegram_update() -> MagicMock:
     update = MagicMock()
     update.effective_chat.id = 123
     update.message.voice.file_id = "test-file-id"
+    update.message.voice.duration = 3
     update.message.reply_text = AsyncMock()
     return update
 
@@ -56,7 +57,9 @@ def mock_telegram_context() -> MagicMock:
     context.bot.get_file = AsyncMock()
 
     mock_file = MagicMock()
-    mock_file.download_as_bytearray = AsyncMock(return_value=bytearray(b"audio data"))
+    mock_file.download_to_memory = AsyncMock(
+        side_effect=lambda out: out.write(b"audio data")
+    )
     context.bot.get_file.return_value = mock_file
 
     return context
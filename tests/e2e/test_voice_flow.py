@@ -5,6 +5,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from pytest_httpx import HTTPXMock
+from telegram.error import BadRequest
 
 from voice_agent.bot import VoiceAgentBot
 from voice_agent.config import Settings
@@ -15,6 +16,7 @@ def _make_voice_update(chat_id: int = 123) -> MagicMock:
     update = MagicMock()
     update.effective_chat.id = chat_id
     update.message.voice.file_id = "test-file-id"
+    update.message.voice.duration = 3
     update.message.reply_text = AsyncMock()
     update.message.delete = AsyncMock()
     update.message.chat.send_message = AsyncMock()
@@ -25,7 +27,7 @@ def _make_voice_context(audio: bytes = b"audio") -> MagicMock:
     """Create a mock Telegram context for voice downloads."""
     context = MagicMock()
     mock_file = MagicMock()
-    mock_file.download_as_bytearray = AsyncMock(return_value=bytearray(audio))
+    mock_file.download_to_memory = AsyncMock(side_effect=lambda out: out.write(audio))
     context.bot.get_file = AsyncMock(return_value=mock_file)
     return context
 
@@ -149,6 +151,59 @@ class TestVoiceFlow:
         context.bot.get_file.assert_not_called()
         update.message.reply_text.assert_not_called()
 
+    async def test_short_voice_skipped(
+        self,
+        e2e_bot: VoiceAgentBot,
+    ) -> None:
+        """Test accidental sub-second voice notes are not transcribed."""
+        update = _make_voice_update()
+        update.message.voice.duration = 0
+        context = _make_voice_context()
+
+        await e2e_bot.handle_voice(update, context)
+
+        context.bot.get_file.assert_not_called()
+        update.message.reply_text.assert_called_once_with("Voice message too short.")
+
+    async def test_voice_notes_prompted_in_spoken_order(
+        self,
+        e2e_bot: VoiceAgentBot,
+    ) -> None:
+        """Test a faster later voice note waits for the one before it."""
+        first_done = asyncio.Event()
+        prompts: list[str] = []
+
+        async def fake_transcribe(audio, *args, **kwargs):  # type: ignore
+            text = audio.read().decode()
+            if text == "first":
+                await first_done.wait()
+            return text
+
+        async def fake_handle_prompt(chat_id, text, update):  # type: ignore
+            prompts.append(text)
+
+        with (
+            patch("voice_agent.bot.transcribe", fake_transcribe),
+            patch.object(e2e_bot, "_handle_prompt", side_effect=fake_handle_prompt),
+        ):
+            first = asyncio.create_task(
+                e2e_bot.handle_voice(
+                    _make_voice_update(), _make_voice_context(b"first")
+                )
+            )
+            second = asyncio.create_task(
+                e2e_bot.handle_voice(
+                    _make_voice_update(), _make_voice_context(b"second")
+                )
+            )
+            await asyncio.sleep(0.01)
+            assert prompts == []
+            first_done.set()
+            await asyncio.gather(first, second)
+
+        assert prompts == ["first", "second"]
+        assert 123 not in e2e_bot._chats
+
     async def test_transcription_error_handling(
         self,
         e2e_bot: VoiceAgentBot,
@@ -165,9 +220,50 @@ class TestVoiceFlow:
 
         await e2e_bot.handle_voice(update, context)
 
-        calls = update.message.reply_text.call_args_list
+        # The voice message is deleted while transcribing, so the error is
+        # posted to the chat rather than as a reply
+        update.message.delete.assert_called_once()
+        calls = update.message.chat.send_message.call_args_list
         assert any("Transcription failed" in str(call) for call in calls)
 
+    async def test_unexpected_transcription_error_reported(
+        self,
+        e2e_bot: VoiceAgentBot,
+    ) -> None:
+        """Test an error other than TranscriptionError still reaches the user."""
+        update = _make_voice_update()
+        context = _make_voice_context()
+
+        with patch(
+            "voice_agent.bot.transcribe", AsyncMock(side_effect=ValueError("boom"))
+        ):
+            await e2e_bot.handle_voice(update, context)
+
+        update.message.delete.assert_awaited_once()
+        calls = update.message.chat.send_message.call_args_list
+        assert any("Transcription failed: boom" in str(call) for call in calls)
+
+    async def test_failed_delete_does_not_drop_prompt(
+        self,
+        e2e_bot: VoiceAgentBot,
+        httpx_mock: HTTPXMock,
+    ) -> None:
+        """Test the prompt is still sent when the voice note can't be deleted."""
+        httpx_mock.add_response(
+            url="http://localhost:8080/transcribe",
+            json={"text": "run the tests"},
+        )
+        update = _make_voice_update()
+        update.message.delete = AsyncMock(
+            side_effect=BadRequest("Message can't be deleted")
+        )
+        context = _make_voice_context()
+
+        with patch.object(e2e_bot, "_handle_prompt", AsyncMock()) as handle_prompt:
+            await e2e_bot.handle_voice(update, context)
+
+        handle_prompt.assert_awaited_once_with(123, "run the tests", update)
+
     async def test_download_error_handling(
         self,
         e2e_bot: VoiceAgentBot,
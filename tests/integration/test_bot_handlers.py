@@ -4,11 +4,29 @@ import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-
-from voice_agent.bot import VoiceAgentBot
+from telegram.error import BadRequest
+from telegram.ext import AIORateLimiter
+
+from voice_agent.bot import (
+    _MAX_QUEUED_PROMPTS,
+    _PERMISSION_KEYBOARD,
+    _STOP_KEYBOARD,
+    VoiceAgentBot,
+    _split_message,
+)
 from voice_agent.config import Settings
 
 
+async def _wait_idle(bot: VoiceAgentBot, chat_id: int = 123) -> None:
+    """Wait until a chat's prompts have finished and its state is dropped."""
+
+    async def idle() -> None:
+        while chat_id in bot._chats:
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(idle(), timeout=1)
+
+
 @pytest.fixture
 def bot(mock_settings: Settings) -> VoiceAgentBot:
     """Create a bot instance for testing."""
@@ -33,6 +51,25 @@ class TestVoiceAgentBot:
         assert test_bot.is_allowed(123) is True
         assert test_bot.is_allowed(999) is True
 
+    def test_command_handlers_cover_simple_commands(self, bot: VoiceAgentBot) -> None:
+        """Test every command without extra data has a dispatch entry."""
+        from voice_agent.router import CommandType
+
+        handled_inline = {CommandType.SWITCH_PROJECT, CommandType.PROMPT}
+        assert set(bot._command_handlers) == set(CommandType) - handled_inline
+
+    async def test_acl_gate_stops_non_allowed_chat(self, bot: VoiceAgentBot) -> None:
+        """Test the ACL gate stops dispatch only for non-allowed chats."""
+        from telegram.ext import ApplicationHandlerStop
+
+        update = MagicMock()
+        update.effective_chat.id = 123
+        await bot._acl_gate(update, MagicMock())
+
+        update.effective_chat.id = 999
+        with pytest.raises(ApplicationHandlerStop):
+            await bot._acl_gate(update, MagicMock())
+
     async def test_start_command_allowed(self, bot: VoiceAgentBot) -> None:
         """Test /start command for allowed chat."""
         update = MagicMock()
@@ -99,6 +136,17 @@ class TestVoiceAgentBot:
         # Silent approval - no message sent
         update.message.reply_text.assert_not_called()
 
+    async def test_handle_transcription_blank_ignored(self, bot: VoiceAgentBot) -> None:
+        """Test whitespace-only text is dropped before parsing."""
+        update = MagicMock()
+        update.message.reply_text = AsyncMock()
+
+        with patch.object(bot, "_handle_prompt", AsyncMock()) as handle_prompt:
+            await bot._handle_transcription(123, "  \n ", update)
+
+        handle_prompt.assert_not_called()
+        update.message.reply_text.assert_not_called()
+
     async def test_handle_transcription_reject(self, bot: VoiceAgentBot) -> None:
         """Test handling rejection transcription."""
         from voice_agent.sessions.permissions import PendingPermission
@@ -310,6 +358,145 @@ class TestVoiceAgentBot:
         same_session = bot.session_manager.get(123)
         assert same_session.message_count == 5
 
+    async def test_revoke_callback_by_index(self, bot: VoiceAgentBot) -> None:
+        """Test revoke_<index> callback removes that sticky approval."""
+        from voice_agent.sessions.permissions import StickyApproval
+
+        session = bot.session_manager.get_or_create(123)
+        session.permission_handler.sticky_approvals.append(
+            StickyApproval(tool_name="Bash", pattern={"command": "ls"})
+        )
+
+        update = MagicMock()
+        query = MagicMock()
+        query.data = "revoke_0"
+        query.message.chat.id = 123
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        update.callback_query = query
+
+        await bot.handle_callback(update, MagicMock())
+
+        assert "Revoked:" in query.edit_message_text.call_args[0][0]
+        assert session.permission_handler.sticky_approvals == []
+
+    async def test_revoke_callback_keeps_remaining_list(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test revoking one of several approvals re-renders the rest."""
+        from voice_agent.sessions.permissions import StickyApproval
+
+        session = bot.session_manager.get_or_create(123)
+        for command in ("ls", "pwd"):
+            session.permission_handler.sticky_approvals.append(
+                StickyApproval(tool_name="Bash", pattern={"command": command})
+            )
+
+        update = MagicMock()
+        query = MagicMock()
+        query.data = "revoke_0"
+        query.message.chat.id = 123
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        update.callback_query = query
+
+        await bot.handle_callback(update, MagicMock())
+
+        text = query.edit_message_text.call_args[0][0]
+        keyboard = query.edit_message_text.call_args.kwargs["reply_markup"]
+        assert text.startswith("Revoked:")
+        assert "1. " in text and "2. " not in text
+        assert [[b.callback_data for b in row] for row in keyboard.inline_keyboard] == [
+            ["revoke_0"],
+            ["revoke_all"],
+        ]
+
+    async def test_unknown_command_deletes_while_prompting(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test the command message is deleted without delaying the prompt."""
+        prompted = asyncio.Event()
+        update = MagicMock()
+        update.effective_chat.id = 123
+        update.message.text = "/commit"
+        # The delete only finishes once the prompt has been queued
+        update.message.delete = AsyncMock(side_effect=prompted.wait)
+
+        async def handle_prompt(*args: object) -> None:
+            prompted.set()
+
+        with patch.object(bot, "_handle_prompt", side_effect=handle_prompt) as hp:
+            await asyncio.wait_for(bot.unknown_command(update, MagicMock()), 1)
+
+        hp.assert_called_once_with(123, "/commit", update)
+        update.message.delete.assert_awaited_once()
+
+    async def test_session_close_confirm_callback_not_shadowed(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test session_close_confirm_ wins over the shorter session_close_."""
+        update = MagicMock()
+        query = MagicMock()
+        query.data = "session_close_confirm_my_work"
+        query.message.chat.id = 123
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        update.callback_query = query
+
+        await bot.handle_callback(update, MagicMock())
+
+        # Routed to the confirm handler with the full name, not to the
+        # close handler with "confirm_my_work"
+        query.edit_message_text.assert_called_once_with(
+            "Session 'my_work' not found."
+        )
+
+    async def test_rename_flow_clears_chat_state(self, bot: VoiceAgentBot) -> None:
+        """Test a rename button press is consumed by the next text message."""
+        bot.session_manager.get_or_create(123)
+
+        update = MagicMock()
+        query = MagicMock()
+        query.data = "session_rename_main"
+        query.message.chat.id = 123
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        update.callback_query = query
+        await bot.handle_callback(update, MagicMock())
+        assert bot._chats[123].pending_rename == "main"
+
+        text_update = MagicMock()
+        text_update.effective_chat.id = 123
+        text_update.message.text = "work"
+        text_update.message.reply_text = AsyncMock()
+        await bot.handle_text(text_update, MagicMock())
+
+        text_update.message.reply_text.assert_called_once_with(
+            "Renamed 'main' → 'work'"
+        )
+        assert 123 not in bot._chats
+
+    async def test_sessions_dialog_keyboard_layout(self, bot: VoiceAgentBot) -> None:
+        """Test the sessions dialog groups buttons in rows of two."""
+        for name in ("main", "a", "b"):
+            bot.session_manager.create_new(123, name=name)
+
+        update = MagicMock()
+        update.message.reply_text = AsyncMock()
+        await bot._handle_sessions(123, update)
+
+        keyboard = update.message.reply_text.call_args.kwargs["reply_markup"]
+        rows = [[b.callback_data for b in row] for row in keyboard.inline_keyboard]
+        assert rows == [
+            ["session_switch_main", "session_switch_a"],
+            ["session_switch_b"],
+            ["session_new"],
+            ["session_rename_main", "session_rename_a"],
+            ["session_rename_b"],
+            ["session_close_main", "session_close_a"],
+            ["session_close_b"],
+        ]
+
     async def test_restart_command(self, bot: VoiceAgentBot) -> None:
         """Test /restart command shows confirmation."""
         # Create existing session
@@ -340,6 +527,63 @@ class TestVoiceAgentBot:
 
         update.message.reply_text.assert_not_called()
 
+    async def test_http_client_shared_and_closed(self, bot: VoiceAgentBot) -> None:
+        """Test the whisper HTTP client is reused and closed on shutdown."""
+        client = bot._get_http_client()
+        assert bot._get_http_client() is client
+
+        await bot._post_shutdown(MagicMock())
+
+        assert client.is_closed
+        assert bot._get_http_client() is not client
+        await bot._post_shutdown(MagicMock())
+
+    def test_build_application_rate_limits_outgoing_calls(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test outgoing Telegram calls go through the rate limiter."""
+        app = bot.build_application()
+
+        assert isinstance(app.bot.rate_limiter, AIORateLimiter)
+
+    def test_run_uses_polling_by_default(self, bot: VoiceAgentBot) -> None:
+        """Test the bot long-polls when no webhook URL is configured."""
+        app = MagicMock()
+        with patch.object(bot, "build_application", return_value=app):
+            bot.run()
+
+        app.run_polling.assert_called_once()
+        app.run_webhook.assert_not_called()
+
+    def test_run_uses_webhook_when_configured(self, bot: VoiceAgentBot) -> None:
+        """Test the bot serves a webhook when a public URL is configured."""
+        bot.settings.webhook_url = "https://bot.example.com/"
+        bot.settings.webhook_secret = "s3cret"
+        app = MagicMock()
+        with (
+            patch.object(bot, "build_application", return_value=app),
+            patch("importlib.util.find_spec", return_value=MagicMock()),
+        ):
+            bot.run()
+
+        app.run_polling.assert_not_called()
+        kwargs = app.run_webhook.call_args.kwargs
+        assert kwargs["webhook_url"] == "https://bot.example.com/telegram"
+        assert kwargs["secret_token"] == "s3cret"
+
+    def test_run_webhook_without_extra_fails_clearly(self, bot: VoiceAgentBot) -> None:
+        """Test webhook mode fails at startup when tornado is not installed."""
+        bot.settings.webhook_url = "https://bot.example.com/"
+        app = MagicMock()
+        with (
+            patch.object(bot, "build_application", return_value=app),
+            patch("importlib.util.find_spec", return_value=None),
+            pytest.raises(RuntimeError, match="webhooks extra"),
+        ):
+            bot.run()
+
+        app.run_webhook.assert_not_called()
+
 
 @pytest.mark.integration
 class TestPhotoHandler:
@@ -450,3 +694,476 @@ class TestPhotoHandler:
 
         mock_telegram_photo_context.bot.get_file.assert_not_called()
         mock_telegram_photo_update.message.reply_text.assert_not_called()
+
+
+@pytest.mark.integration
+class TestPromptStreaming:
+    """Tests for streaming Claude output to Telegram."""
+
+    async def test_small_chunks_coalesced(self, bot: VoiceAgentBot) -> None:
+        """Test fast small chunks are sent as a single message."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.delete = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            for part in ("one", "two", "three"):
+                yield part  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_send_formatted", AsyncMock()) as send,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        # Output replaces the "Working..." message, which is not deleted
+        send.assert_called_once_with(
+            update, "one\ntwo\nthree", 123, edit=working_msg, cache=False
+        )
+        working_msg.delete.assert_not_called()
+
+    async def test_repeated_chunk_dropped(self, bot: VoiceAgentBot) -> None:
+        """Test a chunk identical to the previous one is not shown twice."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            for part in ("Let me check.", "Let me check.", "Done.", "Let me check."):
+                yield part  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_send_formatted", AsyncMock()) as send,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        send.assert_called_once_with(
+            update,
+            "Let me check.\nDone.\nLet me check.",
+            123,
+            edit=working_msg,
+            cache=False,
+        )
+
+    async def test_large_chunk_flushed_immediately(self, bot: VoiceAgentBot) -> None:
+        """Test a chunk past the size threshold is flushed on its own."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.edit_reply_markup = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+        big = "x" * 4000
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            yield big  # type: ignore[misc]
+            yield "tail"  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_send_formatted", AsyncMock()) as send,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        assert [c.args[1] for c in send.call_args_list] == [big, "tail"]
+        # The first flush took over the "Working..." message and its Stop
+        # button, which is removed once streaming ends
+        assert send.call_args_list[0].kwargs["edit"] is working_msg
+        working_msg.edit_reply_markup.assert_awaited_once_with(reply_markup=None)
+
+    async def test_buffered_output_flushed_when_stream_goes_quiet(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test buffered output is sent while waiting on a stalled stream."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.edit_reply_markup = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+        release = asyncio.Event()
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            yield "thinking"  # type: ignore[misc]
+            await release.wait()
+            yield "done"  # type: ignore[misc]
+
+        with (
+            patch.object(bot.settings, "stream_flush_interval", 0.01),
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_send_formatted", AsyncMock()) as send,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await asyncio.sleep(0.05)
+            send.assert_called_once_with(
+                update,
+                "thinking",
+                123,
+                edit=working_msg,
+                reply_markup=_STOP_KEYBOARD,
+                cache=False,
+            )
+            release.set()
+            await _wait_idle(bot)
+
+        # The rest is appended to the same message
+        assert send.call_count == 2
+        send.assert_called_with(
+            update,
+            "thinking\ndone",
+            123,
+            edit=working_msg,
+            reply_markup=_STOP_KEYBOARD,
+            cache=False,
+        )
+
+    async def test_permission_callback_bound_once_per_chat(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test prompts reuse the chat's permission callback."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        send_message = AsyncMock()
+        update.get_bot.return_value.send_message = send_message
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            yield "ok"  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_send_formatted", AsyncMock()),
+            patch.object(
+                bot.session_manager,
+                "set_notify_callback",
+                wraps=bot.session_manager.set_notify_callback,
+            ) as set_callback,
+        ):
+            for _ in range(2):
+                await bot._handle_prompt(123, "hello", update)
+                await _wait_idle(bot)
+
+        set_callback.assert_called_once()
+        callback = set_callback.call_args.args[1]
+        await callback("Bash", {"command": "make"})
+        send_message.assert_called_with(
+            123, "🍎 Run: make", reply_markup=_PERMISSION_KEYBOARD
+        )
+
+    async def test_prompt_refused_when_queue_full(self, bot: VoiceAgentBot) -> None:
+        """Test new prompts are refused once too many are queued for a chat."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        send_message = AsyncMock()
+        update.get_bot.return_value.send_message = send_message
+        bot._chat_state(123).pending = _MAX_QUEUED_PROMPTS
+
+        with patch.object(bot.session_manager, "send_prompt") as send_prompt:
+            await bot._handle_prompt(123, "hello", update)
+
+        send_prompt.assert_not_called()
+        assert "Too many queued prompts" in send_message.call_args.args[1]
+        assert bot._chats[123].pending == _MAX_QUEUED_PROMPTS
+
+    async def test_output_moves_to_new_message_when_full(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test streamed output is edited in place until a message fills up."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.edit_reply_markup = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+        next_msg = MagicMock()
+        first, second, third = "a" * 2000, "b" * 1000, "c" * 1000
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            for part in (first, second, third):
+                yield part  # type: ignore[misc]
+                await asyncio.sleep(0.01)
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot.settings, "stream_flush_interval", 0.001),
+            patch.object(
+                bot, "_send_formatted", AsyncMock(return_value=next_msg)
+            ) as send,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        calls = [(c.args[1], c.kwargs.get("edit")) for c in send.call_args_list]
+        assert calls == [
+            (first, working_msg),
+            (f"{first}\n{second}", working_msg),
+            (third, None),
+        ]
+        working_msg.edit_reply_markup.assert_awaited_once_with(reply_markup=None)
+
+    async def test_output_moves_on_when_escaped_edit_would_overflow(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test the in-place edit is sized by its formatted, tagged length."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.edit_reply_markup = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+        next_msg = MagicMock()
+        # Under the raw flush size together, but "." escapes to two characters
+        first, second = "." * 2000, "." * 1000
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            for part in (first, second):
+                yield part  # type: ignore[misc]
+                await asyncio.sleep(0.01)
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot.settings, "stream_flush_interval", 0.001),
+            patch.object(
+                bot, "_send_formatted", AsyncMock(return_value=next_msg)
+            ) as send,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        calls = [(c.args[1], c.kwargs.get("edit")) for c in send.call_args_list]
+        assert calls == [(first, working_msg), (second, None)]
+        assert all(c.kwargs["cache"] is False for c in send.call_args_list)
+
+    async def test_whitespace_chunk_does_not_break_stream(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test a whitespace-only chunk is not edited in as an unchanged text."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.edit_reply_markup = AsyncMock()
+        # Telegram rejects a second edit that only adds trailing whitespace
+        working_msg.edit_text = AsyncMock(
+            side_effect=[None, BadRequest("Message is not modified")]
+        )
+        tg_bot = update.get_bot.return_value
+        tg_bot.send_message = AsyncMock(return_value=working_msg)
+        finished = False
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            nonlocal finished
+            for part in ("a", " "):
+                yield part  # type: ignore[misc]
+                await asyncio.sleep(0.01)
+            finished = True
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot.settings, "stream_flush_interval", 0.001),
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        assert finished
+        working_msg.edit_text.assert_awaited_once()
+        sent = [c.args[1] for c in tg_bot.send_message.call_args_list]
+        assert not any(text.startswith("Error") for text in sent)
+
+    async def test_unmodified_edit_treated_as_sent(self) -> None:
+        """Test an edit Telegram rejects as unchanged is not retried or raised."""
+        msg = MagicMock()
+        msg.edit_text = AsyncMock(side_effect=BadRequest("Message is not modified"))
+
+        result = await VoiceAgentBot._send_part(
+            MagicMock(), 123, "done", "done", None, edit=msg, reply_markup=None
+        )
+
+        assert result is msg
+        msg.edit_text.assert_awaited_once()
+
+    async def test_chat_state_released_after_prompt(self, bot: VoiceAgentBot) -> None:
+        """Test per-chat lock and cancel state are dropped once idle."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        update.get_bot.return_value.send_message = AsyncMock()
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            yield "done"  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_send_formatted", AsyncMock()),
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await _wait_idle(bot)
+
+        assert 123 not in bot._chats
+
+    async def test_cancel_button_interrupts_stalled_stream(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test the Stop button ends a prompt without waiting for a chunk."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        working_msg = MagicMock()
+        working_msg.edit_text = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock(return_value=working_msg)
+        started = asyncio.Event()
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            started.set()
+            await asyncio.sleep(60)
+            yield "never"  # type: ignore[misc]
+
+        query = MagicMock()
+        query.data = "cancel"
+        query.message.chat.id = 123
+        query.answer = AsyncMock()
+        query.edit_message_text = AsyncMock()
+        callback_update = MagicMock()
+        callback_update.callback_query = query
+        bot.session_manager.get_or_create(123)
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_discard_client", AsyncMock()) as discard,
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await started.wait()
+            task = bot._chats[123].running
+            assert task is not None
+            await bot.handle_callback(callback_update, MagicMock())
+            await asyncio.wait_for(task, timeout=1)
+
+        discard.assert_awaited_once_with(123)
+        working_msg.edit_text.assert_awaited_once_with("⏹️ Task cancelled.")
+        query.edit_message_text.assert_not_called()
+
+    async def test_cancel_command_waits_for_prompt(self, bot: VoiceAgentBot) -> None:
+        """Test the cancel command returns once the prompt has stopped."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        update.message.reply_text = AsyncMock()
+        update.get_bot.return_value.send_message = AsyncMock()
+        started = asyncio.Event()
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            started.set()
+            await asyncio.sleep(60)
+            yield "never"  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_discard_client", AsyncMock()),
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await started.wait()
+            task = bot._chats[123].running
+            assert task is not None
+            await bot._handle_transcription(123, "stop task", update)
+
+        assert task.done()
+        update.message.reply_text.assert_awaited_once_with("⏹️ Task cancelled.")
+        assert 123 not in bot._chats
+
+    async def test_send_formatted_plain_text_skips_markdown(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test text without Markdown characters is sent without parse mode."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        send = update.get_bot.return_value.send_message = AsyncMock()
+
+        await bot._send_formatted(update, "All tests pass")
+
+        send.assert_awaited_once_with(
+            123, "All tests pass", parse_mode=None, reply_markup=None
+        )
+
+    async def test_send_formatted_converts_markdown(self, bot: VoiceAgentBot) -> None:
+        """Test text with Markdown is converted to MarkdownV2."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        send = update.get_bot.return_value.send_message = AsyncMock()
+
+        await bot._send_formatted(update, "**Done.**")
+
+        send.assert_awaited_once_with(
+            123, "*Done\\.*", parse_mode="MarkdownV2", reply_markup=None
+        )
+
+    async def test_send_formatted_splits_long_text(self, bot: VoiceAgentBot) -> None:
+        """Test text past the message limit is split at a line break."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        send = update.get_bot.return_value.send_message = AsyncMock()
+        working_msg = MagicMock()
+        working_msg.edit_text = AsyncMock()
+        first, second = "a" * 3000, "b" * 3000
+
+        await bot._send_formatted(
+            update,
+            f"{first}\n{second}",
+            edit=working_msg,
+            reply_markup=_STOP_KEYBOARD,
+        )
+
+        # The first part takes over the edited message and its keyboard
+        working_msg.edit_text.assert_awaited_once_with(
+            first, parse_mode=None, reply_markup=_STOP_KEYBOARD
+        )
+        send.assert_awaited_once_with(123, second, parse_mode=None, reply_markup=None)
+
+    async def test_send_formatted_splits_escaped_text_within_limit(
+        self, bot: VoiceAgentBot
+    ) -> None:
+        """Test parts are sized by their escaped length, keeping formatting."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        send = update.get_bot.return_value.send_message = AsyncMock()
+        # Each "." is escaped to "\\.", doubling the formatted length
+        text = "**Done**\n" + "." * 4000
+
+        await bot._send_formatted(update, text)
+
+        sent = [c.args[1] for c in send.call_args_list]
+        assert len(sent) > 1
+        assert all(len(part) <= 4096 for part in sent)
+        assert all(c.kwargs["parse_mode"] == "MarkdownV2" for c in send.call_args_list)
+
+    def test_split_message_without_line_breaks(self) -> None:
+        """Test text with no line break is cut at the limit."""
+        assert _split_message("abcdefg", limit=3) == ["abc", "def", "g"]
+        assert _split_message("ab\ncd", limit=4) == ["ab", "cd"]
+
+    async def test_restart_stops_running_prompt_first(self, bot: VoiceAgentBot) -> None:
+        """Test restart waits for the running prompt before replacing it."""
+        update = MagicMock()
+        update.effective_chat.id = 123
+        update.get_bot.return_value.send_message = AsyncMock()
+        started = asyncio.Event()
+        old_session = bot.session_manager.get_or_create(123)
+        old_session.claude_session_id = "abc"
+
+        async def mock_send_prompt(*args: object, **kwargs: object) -> None:
+            started.set()
+            await asyncio.sleep(60)
+            yield "never"  # type: ignore[misc]
+
+        with (
+            patch.object(bot.session_manager, "send_prompt", mock_send_prompt),
+            patch.object(bot, "_discard_client", AsyncMock()),
+        ):
+            await bot._handle_prompt(123, "hello", update)
+            await started.wait()
+            task = bot._chats[123].running
+            assert task is not None
+            msg = await bot._do_restart(123)
+
+        assert task.done()
+        assert "Restarted" in msg
+        new_session = bot.session_manager.get(123)
+        assert new_session is not old_session
+        assert new_session.claude_session_id == "abc"
@@ -1,11 +1,15 @@
 """Integration tests for session manager."""
 
 import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from voice_agent.sessions import ImageAttachment, SessionManager
+from voice_agent.sessions.manager import Session
+from voice_agent.sessions.storage import SessionStorage
 
 
 @pytest.mark.integration
@@ -70,6 +74,17 @@ class TestSessionManager:
         assert "Working directory: /code" in status
         assert "Messages: 0" in status
 
+    def test_get_status_age_from_created_at(self) -> None:
+        """Test a restored session's age counts from its stored creation time."""
+        session = Session(
+            chat_id=123,
+            name="main",
+            cwd="/code",
+            created_at=datetime.now() - timedelta(hours=2, minutes=5),
+        )
+
+        assert "Age: 2h 5m" in session.get_status()
+
     def test_get_status_no_session(self, session_manager: SessionManager) -> None:
         """Test getting status without session."""
         status = session_manager.get_status(999)
@@ -85,6 +100,20 @@ class TestSessionManager:
         assert session2.chat_id == 456
         assert session2.cwd == "/path/2"
 
+    async def test_notify_callback_reaches_existing_sessions(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test a callback set after sessions exist is used by all of them."""
+        main = session_manager.get_or_create(123, name="main")
+        work = session_manager.create_new(123, name="work")
+        callback = AsyncMock()
+
+        session_manager.set_notify_callback(123, callback)
+        await main.permission_handler.notify_callback("Write", {})  # type: ignore
+        await work.permission_handler.notify_callback("Bash", {})  # type: ignore
+
+        assert [c.args[0] for c in callback.await_args_list] == ["Write", "Bash"]
+
     def test_session_status_with_pending_permission(
         self, session_manager: SessionManager
     ) -> None:
@@ -100,6 +129,34 @@ class TestSessionManager:
         assert "Pending approval" in status
         assert "Write file" in status
 
+    def test_persist_reuses_stored_snapshot(self, tmp_path: Path) -> None:
+        """Test that repeated persists update one stored record in place."""
+        storage = SessionStorage(path=tmp_path / "sessions.json")
+        manager = SessionManager(storage=storage)
+        session = manager.get_or_create(123, "/path/1")
+        stored = storage.get_session(123, "main")
+
+        session.message_count = 4
+        manager._persist_session(session)
+
+        assert storage.get_session(123, "main") is stored
+        assert stored is not None
+        assert stored.message_count == 4
+
+    def test_persist_skips_unchanged_session(self, tmp_path: Path) -> None:
+        """Test persisting a session with no changes does not touch storage."""
+        storage = SessionStorage(path=tmp_path / "sessions.json")
+        manager = SessionManager(storage=storage)
+        session = manager.get_or_create(123, "/path/1")
+
+        with patch.object(storage, "save") as mock_save:
+            manager._persist_session(session)
+            mock_save.assert_not_called()
+
+            session.message_count += 1
+            manager._persist_session(session)
+            mock_save.assert_called_once()
+
 
 @pytest.mark.integration
 class TestSessionManagerMultiSession:
@@ -157,6 +214,27 @@ class TestSessionManagerMultiSession:
         name = session_manager.generate_session_name(123)
         assert name == "session-3"
 
+    def test_generate_session_name_not_reused(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test generated names keep counting up after a session is closed."""
+        session_manager.get_or_create(123, name="main")
+        session_manager.create_new(123, name=session_manager.generate_session_name(123))
+        session_manager.close_session(123, "session-2")
+
+        assert session_manager.generate_session_name(123) == "session-3"
+
+    def test_session_counter_dropped_with_last_session(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test the name counter is pruned once a chat has no sessions."""
+        session_manager.get_or_create(123, name="main")
+        session_manager.generate_session_name(123)
+
+        session_manager.close_session(123, "main")
+
+        assert 123 not in session_manager._next_session_num
+
     def test_close_session(self, session_manager: SessionManager) -> None:
         """Test closing a specific session."""
         session_manager.get_or_create(123, name="main")
@@ -169,6 +247,85 @@ class TestSessionManagerMultiSession:
         assert len(sessions) == 1
         assert sessions[0].name == "main"
 
+    async def test_shutdown_waits_for_background_close(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test shutdown() joins client closes started by close_session()."""
+        session = session_manager.create_new(123, name="work")
+        client = MagicMock()
+        session.sdk_client = client
+
+        session_manager.close_session(123, "work")
+        await session_manager.shutdown()
+
+        client._transport._process.terminate.assert_called_once()
+        assert not session_manager._pending_closes
+
+    async def test_cli_path_resolved_once(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test the Claude CLI is looked up once for all new clients."""
+        main = session_manager.get_or_create(123, name="main")
+        work = session_manager.create_new(123, name="work")
+
+        with (
+            patch("shutil.which", return_value="/usr/bin/claude") as mock_which,
+            patch("claude_agent_sdk.ClaudeAgentOptions") as mock_options,
+            patch("claude_agent_sdk.ClaudeSDKClient", return_value=AsyncMock()),
+        ):
+            await session_manager._get_or_create_client(main)
+            await session_manager._get_or_create_client(work)
+
+        mock_which.assert_called_once_with("claude")
+        assert mock_options.call_args.kwargs["cli_path"] == "/usr/bin/claude"
+
+    async def test_least_recently_used_client_closed_at_cap(self) -> None:
+        """Test opening a client past the cap closes the oldest idle one."""
+        manager = SessionManager(max_live_clients=2)
+        main = manager.get_or_create(123, name="main")
+        work = manager.create_new(123, name="work")
+        other = manager.get_or_create(456)
+
+        with (
+            patch("shutil.which", return_value="/usr/bin/claude"),
+            patch("claude_agent_sdk.ClaudeAgentOptions"),
+            patch(
+                "claude_agent_sdk.ClaudeSDKClient",
+                side_effect=lambda **_: MagicMock(),
+            ),
+        ):
+            await manager._get_or_create_client(main)
+            work_client = await manager._get_or_create_client(work)
+            # Using main again makes work the least recently used
+            await manager._get_or_create_client(main)
+            await manager._get_or_create_client(other)
+
+        assert main.sdk_client is not None
+        assert work.sdk_client is None
+        assert other.sdk_client is not None
+        work_client._transport._process.terminate.assert_called_once()
+
+    async def test_busy_client_not_evicted(self) -> None:
+        """Test a session mid-prompt keeps its client even when it is oldest."""
+        manager = SessionManager(max_live_clients=1)
+        main = manager.get_or_create(123)
+        other = manager.get_or_create(456)
+
+        with (
+            patch("shutil.which", return_value="/usr/bin/claude"),
+            patch("claude_agent_sdk.ClaudeAgentOptions"),
+            patch(
+                "claude_agent_sdk.ClaudeSDKClient",
+                side_effect=lambda **_: MagicMock(),
+            ),
+        ):
+            await manager._get_or_create_client(main)
+            manager._busy.add(id(main))
+            await manager._get_or_create_client(other)
+
+        assert main.sdk_client is not None
+        assert other.sdk_client is not None
+
     def test_close_active_session_switches(
         self, session_manager: SessionManager
     ) -> None:
@@ -185,6 +342,20 @@ class TestSessionManagerMultiSession:
         # Active should be main now
         assert session_manager.get_active_session_name(123) == "main"
 
+    def test_close_active_session_falls_back_to_most_recent(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test closing the active session switches to the last one used."""
+        session_manager.get_or_create(123, name="main")
+        session_manager.create_new(123, name="work")
+        session_manager.create_new(123, name="docs")
+        session_manager.switch_session(123, "work")
+        session_manager.switch_session(123, "docs")
+
+        session_manager.close_session(123, "docs")
+
+        assert session_manager.get_active_session_name(123) == "work"
+
     def test_session_info_is_active(self, session_manager: SessionManager) -> None:
         """Test SessionInfo.is_active flag."""
         session_manager.get_or_create(123, name="main")
@@ -197,6 +368,55 @@ class TestSessionManagerMultiSession:
         assert work_info.is_active is True
         assert main_info.is_active is False
 
+    def test_get_session_info(self, session_manager: SessionManager) -> None:
+        """Test looking up info for a single session by name."""
+        session_manager.get_or_create(123, name="main")
+        session_manager.create_new(123, name="work")
+        session_manager.get(123, "main").message_count = 3  # type: ignore[union-attr]
+
+        info = session_manager.get_session_info(123, "main")
+
+        assert info is not None
+        assert info.message_count == 3
+        assert info.is_active is False
+        assert session_manager.get_session_info(123, "missing") is None
+        assert session_manager.get_session_info(999, "main") is None
+
+    def test_get_active_session_index(self, session_manager: SessionManager) -> None:
+        """Test the active session's position follows list_sessions order."""
+        assert session_manager.get_active_session_index(123) is None
+
+        session_manager.get_or_create(123, name="main")
+        session_manager.create_new(123, name="work")
+        assert session_manager.get_active_session_index(123) == 1
+
+        session_manager.switch_session(123, "main")
+        assert session_manager.get_active_session_index(123) == 0
+
+        # Renaming moves a session to the end; closing shifts later ones up
+        session_manager.rename_session(123, "main", "home")
+        assert session_manager.get_active_session_index(123) == 1
+        session_manager.close_session(123, "work")
+        assert session_manager.get_active_session_index(123) == 0
+
+    def test_get_follows_active_session(self, session_manager: SessionManager) -> None:
+        """Test get() tracks the active session through switch, rename, close."""
+        main = session_manager.get_or_create(123, name="main")
+        work = session_manager.create_new(123, name="work")
+        assert session_manager.get(123) is work
+
+        session_manager.switch_session(123, "main")
+        assert session_manager.get(123) is main
+
+        session_manager.rename_session(123, "main", "home")
+        assert session_manager.get(123) is main
+
+        session_manager.close_session(123, "home")
+        assert session_manager.get(123) is work
+
+        session_manager.close_session(123, "work")
+        assert session_manager.get(123) is None
+
 
 @pytest.mark.integration
 class TestPermissionCallbackWiring:
@@ -460,3 +680,34 @@ class TestSendPromptWithImage:
         assert content[0]["type"] == "image"
         assert content[1]["type"] == "text"
         assert content[1]["text"] == "What is this?"
+
+
+@pytest.mark.integration
+class TestSendPromptStreaming:
+    """Tests for how send_prompt chunks the SDK response."""
+
+    async def test_text_blocks_of_one_message_yielded_together(
+        self, session_manager: SessionManager
+    ) -> None:
+        """Test each assistant message becomes one newline-joined chunk."""
+        from claude_agent_sdk import AssistantMessage, TextBlock, ToolUseBlock
+
+        async def response():
+            yield AssistantMessage(
+                content=[
+                    TextBlock(text="Reading the file"),
+                    ToolUseBlock(id="t1", name="Read", input={}),
+                    TextBlock(text="then editing it"),
+                ],
+                model="test",
+            )
+            yield AssistantMessage(content=[TextBlock(text="Done")], model="test")
+
+        session = session_manager.get_or_create(123)
+        mock_client = AsyncMock()
+        mock_client.receive_response = response
+        session.sdk_client = mock_client
+
+        chunks = [c async for c in session_manager.send_prompt(123, "go")]
+
+        assert chunks == ["Reading the file\nthen editing it", "Done"]
@@ -42,15 +42,33 @@ class TestSettings:
         )
         assert settings.get_allowed_chat_ids() == set()
 
+    def test_get_allowed_chat_ids_cached(self) -> None:
+        """Test the parsed set is reused and follows the configured string."""
+        settings = Settings(telegram_bot_token="token", allowed_chat_ids="1,2")
+        assert settings.get_allowed_chat_ids() is settings.get_allowed_chat_ids()
+
+        settings.allowed_chat_ids = "3"
+        assert settings.get_allowed_chat_ids() == {3}
+
     def test_default_values(self) -> None:
         """Test default values are applied."""
         settings = Settings(
             telegram_bot_token="token",
         )
         assert settings.whisper_url == "http://localhost:8080/transcribe"
+        assert settings.whisper_concurrency == 2
+        assert settings.stream_flush_interval == 1.0
+        assert settings.stream_flush_chars == 3500
         assert settings.default_cwd == "/code"
         assert settings.permission_timeout == 300
+        assert settings.max_live_clients == 16
         assert settings.projects == {}
+        assert settings.webhook_url == ""
+
+    def test_stream_flush_chars_fits_one_message(self) -> None:
+        """Test the streamed output size cannot exceed a Telegram message."""
+        with pytest.raises(ValueError):
+            Settings(telegram_bot_token="token", stream_flush_chars=5000)
 
     def test_projects_dict(self) -> None:
         """Test projects dictionary."""
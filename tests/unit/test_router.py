@@ -2,6 +2,7 @@
 
 import pytest
 
+from voice_agent import router
 from voice_agent.router import CommandType, parse_command
 
 
@@ -231,3 +232,31 @@ class TestParseCommand:
         result = parse_command(text)
         assert result.command_type == CommandType.SESSIONS
         assert result.text == text
+
+    @pytest.mark.parametrize(
+        ("text", "expected"),
+        [
+            ("please always approve these", CommandType.STICKY_APPROVE),
+            ("can you clear approvals now", CommandType.CLEAR_STICKY),
+            ("show approvals please", CommandType.LIST_APPROVALS),
+            ("ok stop task", CommandType.CANCEL),
+            ("what's the progress of stop task", CommandType.STATUS),
+            ("open my sessions", CommandType.SESSIONS),
+        ],
+    )
+    def test_keywords_inside_sentences(self, text: str, expected: CommandType) -> None:
+        """Test substring keywords match mid-sentence in precedence order."""
+        assert parse_command(text).command_type == expected
+
+    def test_exact_phrases_contain_no_substring_keywords(self) -> None:
+        """Test exact phrases can be looked up before substring keywords."""
+        substring_keywords = (
+            router.STATUS_KEYWORDS
+            | router.STICKY_APPROVE_KEYWORDS
+            | router.CLEAR_STICKY_KEYWORDS
+            | router.LIST_APPROVALS_KEYWORDS
+            | router.CANCEL_KEYWORDS
+            | router.SESSIONS_KEYWORDS
+        )
+        for phrase in router._EXACT_COMMANDS:
+            assert not any(keyword in phrase for keyword in substring_keywords)
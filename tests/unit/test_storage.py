@@ -1,11 +1,13 @@
 """Unit tests for session storage."""
 
+import asyncio
 import json
 from pathlib import Path
 
 import pytest
 
 from voice_agent.sessions.storage import (
+    _SAVE_DELAY,
     ChatStoredState,
     SessionStorage,
     StoredSession,
@@ -251,6 +253,47 @@ class TestSessionStorage:
         assert retrieved.cwd == "/code/project"
         assert retrieved.claude_session_id == "test-session-id"
 
+    async def test_writes_deferred_inside_event_loop(self, tmp_path: Path) -> None:
+        """Test that saves made in a running loop are coalesced until flushed."""
+        path = tmp_path / "sessions.json"
+        storage = SessionStorage(path=path)
+        for count in range(3):
+            storage.save(
+                StoredSession(
+                    chat_id=123,
+                    name="main",
+                    cwd="/code/project",
+                    created_at="2024-01-15T10:30:00",
+                    message_count=count,
+                )
+            )
+
+        assert not path.exists()
+
+        storage.flush()
+        retrieved = SessionStorage(path=path).get(123)
+
+        assert retrieved is not None
+        assert retrieved.message_count == 2
+
+    async def test_deferred_write_happens_after_delay(self, tmp_path: Path) -> None:
+        """Test that a deferred save reaches disk without an explicit flush."""
+        path = tmp_path / "sessions.json"
+        storage = SessionStorage(path=path)
+        storage.save(
+            StoredSession(
+                chat_id=123,
+                name="main",
+                cwd="/code/project",
+                created_at="2024-01-15T10:30:00",
+                message_count=0,
+            )
+        )
+
+        await asyncio.sleep(_SAVE_DELAY * 2)
+
+        assert SessionStorage(path=path).get(123) is not None
+
     def test_corrupted_file_starts_fresh(self, tmp_path: Path) -> None:
         """Test that corrupted JSON file results in fresh start."""
         path = tmp_path / "sessions.json"
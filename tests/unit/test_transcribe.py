@@ -113,3 +113,42 @@ class TestTranscribe:
         )
 
         assert result == "hello world"
+
+    async def test_shared_client_left_open(self, httpx_mock: HTTPXMock) -> None:
+        """Test a caller-provided client is reused and not closed."""
+        import httpx
+
+        httpx_mock.add_response(
+            url="http://localhost:8080/transcribe",
+            json={"text": "hello"},
+            is_reusable=True,
+        )
+
+        async with httpx.AsyncClient() as client:
+            for _ in range(2):
+                result = await transcribe(
+                    b"audio data",
+                    "http://localhost:8080/transcribe",
+                    client=client,
+                )
+                assert result == "hello"
+            assert not client.is_closed
+
+    async def test_file_object_uploaded(self, httpx_mock: HTTPXMock) -> None:
+        """Test audio can be streamed from a binary file object."""
+        import io
+
+        httpx_mock.add_response(
+            url="http://localhost:8080/transcribe",
+            json={"text": "hello"},
+        )
+
+        result = await transcribe(
+            io.BytesIO(b"audio data"),
+            "http://localhost:8080/transcribe",
+        )
+
+        assert result == "hello"
+        request = httpx_mock.get_request()
+        assert request is not None
+        assert b"audio data" in request.read()